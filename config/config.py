@@ -15,5 +15,51 @@ DB_CONFIG = {
     "database":"ml_db"
 }
 
+# === Storage backend ===
+# "mysql" (DB_CONFIG) or "sqlite" for an embedded local database file that is
+# created from database_schema.sql on first use (offline/dev runs)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/financial_analysis.db")
+
+# === Connection Pool (web app) ===
+# pool_size=0 disables pooling (one new connection per request)
+DB_POOL_CONFIG = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),  # seconds before a connection is replaced
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 10)),    # seconds to wait for a free connection
+}
+
+# === ML Model Artifacts ===
+MODEL_PATH = "ml_pros_classifier.joblib"
+MODEL_META_PATH = "ml_pros_classifier.meta.json"   # cache key + training metadata
+FLAT_MODEL_DIR = "ml_pros_classifier_flat"         # memory-mappable NumPy export of the forest
+BEST_PARAMS_PATH = "ml_best_params.json"           # written by train_ml_classifier.py --tune
+
+# === Pipeline ===
+# Rows per multi-row INSERT statement in bulk writes
+STORE_BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", 500))
+# analyze_data.py -> store_results.py handoff file for standalone runs (JSON Lines)
+RESULTS_SPILL_PATH = "data/processed/results.jsonl"
+# JSON run reports (stage timings, query counts, peak RSS) written by main.py
+RUN_REPORT_DIR = "data/reports"
+
+# === Web caches ===
+# How often (seconds) the web app re-reads data_version to pick up new pipeline results
+DATA_VERSION_CHECK_INTERVAL = int(os.getenv("DATA_VERSION_CHECK_INTERVAL", 5))
+WEB_CACHE_CONFIG = {
+    "company_page_maxsize": int(os.getenv("COMPANY_PAGE_CACHE_SIZE", 512)),  # rendered pages kept (LRU)
+    "company_page_ttl": int(os.getenv("COMPANY_PAGE_CACHE_TTL", 600)),       # seconds
+    "processed_count_ttl": int(os.getenv("PROCESSED_COUNT_CACHE_TTL", 300)), # seconds
+    "series_maxsize": int(os.getenv("SERIES_CACHE_SIZE", 1024)),              # encoded /series bodies kept (LRU)
+    "series_ttl": int(os.getenv("SERIES_CACHE_TTL", 600)),                    # seconds
+}
+
+# === Online scoring (/api/score) ===
+SCORING_CONFIG = {
+    "max_batch": int(os.getenv("SCORING_MAX_BATCH", 64)),       # requests folded into one predict call
+    "max_wait_ms": float(os.getenv("SCORING_MAX_WAIT_MS", 0)),  # extra wait to fill a batch (0 = only what is queued)
+    "timeout": int(os.getenv("SCORING_TIMEOUT", 5)),            # seconds a request waits for its prediction
+}
+
 # === Excel File (Company IDs) ===
 COMPANY_LIST_PATH = "data/Nifty100Companies.xlsx"
@@ -0,0 +1,113 @@
+# database/connection.py
+#
+# Single entry point for database connections. connect() opens the backend
+# selected by DB_BACKEND: MySQL (mysql.connector with DB_CONFIG) or the
+# embedded SQLite file at SQLITE_PATH (database/sqlite_backend.py, same
+# cursor API and SQL as written for MySQL).
+#
+# Cursors report every statement (duration, rows read and rows written) to
+# a query listener while one is installed; the pipeline's run report
+# (scripts/instrumentation.py) installs itself as the listener. Without a
+# listener cursor() hands out the plain driver cursor.
+
+import time
+
+import mysql.connector
+
+from config.config import DB_CONFIG, DB_BACKEND, SQLITE_PATH
+
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_listener = None
+
+
+def set_query_listener(listener):
+    """Install (or with None remove) the object receiving record_query/record_rows calls"""
+    global _listener
+    _listener = listener
+
+
+def _is_write(operation):
+    return str(operation).lstrip().upper().startswith(_WRITE_VERBS)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, listener):
+        self._cursor = cursor
+        self._listener = listener
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _record(self, operation, start):
+        written = 0
+        if _is_write(operation):
+            written = max(getattr(self._cursor, "rowcount", 0) or 0, 0)
+        self._listener.record_query(operation, time.perf_counter() - start, rows_written=written)
+
+    def execute(self, operation, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            self._record(operation, start)
+
+    def executemany(self, operation, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, *args, **kwargs)
+        finally:
+            self._record(operation, start)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._listener.record_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._listener.record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._listener.record_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._listener.record_rows(1)
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Connection proxy; cursors are instrumented while a query listener is installed"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        listener = _listener
+        return InstrumentedCursor(cursor, listener) if listener is not None else cursor
+
+
+def connect(db_config=None, backend=None):
+    """Open a connection to the configured backend (DB_CONFIG / SQLITE_PATH by default)"""
+    backend = backend or DB_BACKEND
+    if backend == "sqlite":
+        from database.sqlite_backend import connect as sqlite_connect
+        return InstrumentedConnection(sqlite_connect(SQLITE_PATH))
+    if backend != "mysql":
+        raise ValueError(f"Unknown DB_BACKEND {backend!r} (expected 'mysql' or 'sqlite')")
+    return InstrumentedConnection(mysql.connector.connect(**(db_config or DB_CONFIG)))
@@ -0,0 +1,116 @@
+# database/pool.py
+#
+# Small thread-safe MySQL connection pool. Connections are handed out as
+# PooledConnection proxies whose close() returns them to the pool, so code
+# written against plain mysql.connector connections works unchanged.
+
+import threading
+import time
+import queue
+
+import mysql.connector
+
+from database.connection import connect
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within pool_timeout seconds"""
+
+
+class PooledConnection:
+    """Proxy around a pooled connection; close() gives it back to the pool"""
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self._pool._release(conn, self._created_at)
+
+
+class ConnectionPool:
+    """Hands out at most pool_size connections and reuses idle ones.
+
+    Connections older than pool_recycle seconds are closed and replaced,
+    and idle connections are pinged before reuse once they have been idle
+    for ping_after seconds. pool_size=0 disables pooling: every acquire()
+    opens a new connection and close() really closes it (still through a
+    PooledConnection, so closed is reported the same way).
+    """
+
+    def __init__(self, db_config, pool_size=5, pool_recycle=1800, pool_timeout=10, ping_after=30):
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.pool_recycle = pool_recycle
+        self.pool_timeout = pool_timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size) if pool_size > 0 else None
+
+    def _connect(self):
+        return connect(self.db_config)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        if self._slots is None:
+            return PooledConnection(self, self._connect(), time.monotonic())
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise PoolTimeout(f"No free connection after {self.pool_timeout}s (pool_size={self.pool_size})")
+        try:
+            now = time.monotonic()
+            while True:
+                try:
+                    conn, created_at, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    return PooledConnection(self, self._connect(), time.monotonic())
+                if now - created_at > self.pool_recycle:
+                    self._discard(conn)
+                    continue
+                if now - idle_since > self.ping_after and not conn.is_connected():
+                    self._discard(conn)
+                    continue
+                return PooledConnection(self, conn, created_at)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn, created_at):
+        if self._slots is None:
+            self._discard(conn)
+            return
+        try:
+            # End any open (read) transaction so the next user sees fresh data
+            if getattr(conn, "in_transaction", True):
+                conn.rollback()
+            self._idle.put((conn, created_at, time.monotonic()))
+        except Exception:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
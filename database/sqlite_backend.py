@@ -0,0 +1,336 @@
+# database/sqlite_backend.py
+#
+# Embedded SQLite backend for local and offline runs. It exposes the subset
+# of the mysql.connector connection/cursor API the scripts and the web app
+# use (cursor(dictionary=...), execute with %s placeholders, fetch*,
+# description, rowcount, start_transaction, commit/rollback, is_connected)
+# and rewrites the MySQL dialect this repo writes into SQLite:
+#
+#     %s                                  -> ?
+#     INSERT IGNORE                       -> INSERT OR IGNORE
+#     ON DUPLICATE KEY UPDATE c=VALUES(c) -> ON CONFLICT DO UPDATE SET c=excluded.c
+#     GROUP_CONCAT(x ORDER BY k SEPARATOR ';')  -> ordered_concat(k, x, ';')
+#     SET SESSION ...                     -> skipped
+#
+# MD5() and CONCAT_WS() are provided as Python functions. The schema is
+# created from database_schema.sql the first time a database file is opened
+# in a process. Driver errors are re-raised as mysql.connector errors so the
+# existing `except Error` handlers keep working.
+
+import os
+import re
+import decimal
+import hashlib
+import sqlite3
+import threading
+from functools import lru_cache
+
+import mysql.connector
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database_schema.sql")
+
+sqlite3.register_adapter(decimal.Decimal, str)
+try:
+    import numpy as np
+    sqlite3.register_adapter(np.int64, int)
+    sqlite3.register_adapter(np.int32, int)
+    sqlite3.register_adapter(np.float64, float)
+    sqlite3.register_adapter(np.float32, float)
+    sqlite3.register_adapter(np.bool_, int)
+except ImportError:
+    pass
+
+_SINGLE_QUOTED = re.compile(r"'(?:[^']|'')*'")
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_GROUP_CONCAT = re.compile(
+    r"\bGROUP_CONCAT\s*\((.*?)\s+ORDER\s+BY\s+(\w+(?:\.\w+)?)\s+SEPARATOR\s+('(?:[^']|'')*')\s*\)",
+    re.IGNORECASE | re.DOTALL)
+_SKIPPED = re.compile(r"^\s*(SET\s+SESSION|SET\s+NAMES)\b", re.IGNORECASE)
+
+
+def _replace_placeholders(sql):
+    """%s -> ? outside single-quoted literals"""
+    out = []
+    last = 0
+    for literal in _SINGLE_QUOTED.finditer(sql):
+        out.append(sql[last:literal.start()].replace("%s", "?"))
+        out.append(literal.group(0))
+        last = literal.end()
+    out.append(sql[last:].replace("%s", "?"))
+    return "".join(out)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """MySQL statement as written in this repo -> SQLite (None for no-op statements)"""
+    if _SKIPPED.match(sql):
+        return None
+    sql = _INSERT_IGNORE.sub("INSERT OR IGNORE", sql)
+    sql = _GROUP_CONCAT.sub(lambda m: f"ordered_concat({m.group(2)}, {m.group(1)}, {m.group(3)})", sql)
+    match = _ON_DUPLICATE.search(sql)
+    if match:
+        updates = _VALUES_REF.sub(r"excluded.\1", sql[match.end():])
+        sql = sql[:match.start()] + "ON CONFLICT DO UPDATE SET" + updates
+    return _replace_placeholders(sql)
+
+
+# --- Schema -----------------------------------------------------------------
+
+_INLINE_INDEX = re.compile(r"^(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\((.*)\)$", re.IGNORECASE | re.DOTALL)
+_CREATE_TABLE = re.compile(r"^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\(", re.IGNORECASE)
+_CREATE_INDEX = re.compile(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+(?!IF\s)", re.IGNORECASE)
+_MYSQL_ONLY = re.compile(r"^(CREATE\s+DATABASE|USE|DESCRIBE|SHOW)\b", re.IGNORECASE)
+
+
+def _split_top_level(body):
+    """Split a column list on commas that are not inside parentheses"""
+    items, depth, current = [], 0, []
+    for ch in body:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        items.append("".join(current).strip())
+    return items
+
+
+def schema_statements(path=SCHEMA_PATH):
+    """database_schema.sql as a list of SQLite statements"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = "\n".join(line.split("--", 1)[0] for line in f)
+    statements = []
+    for statement in (s.strip() for s in text.split(";")):
+        if not statement or _MYSQL_ONLY.match(statement):
+            continue
+        table = _CREATE_TABLE.match(statement)
+        if table:
+            name = table.group(1)
+            body = statement[table.end():statement.rindex(")")]
+            columns, indexes = [], []
+            for item in _split_top_level(body):
+                index = _INLINE_INDEX.match(item)
+                if index:
+                    unique, index_name, cols = index.groups()
+                    indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS "
+                                   f"{index_name} ON {name} ({cols})")
+                    continue
+                item = re.sub(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", "INTEGER PRIMARY KEY AUTOINCREMENT",
+                              item, flags=re.IGNORECASE)
+                item = re.sub(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", "", item, flags=re.IGNORECASE)
+                columns.append(item)
+            statements.append(f"CREATE TABLE IF NOT EXISTS {name} (\n    " + ",\n    ".join(columns) + "\n)")
+            statements.extend(indexes)
+        elif _CREATE_INDEX.match(statement):
+            statements.append(_CREATE_INDEX.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS ",
+                                                statement))
+        else:
+            statements.append(translate(statement))
+    return [s for s in statements if s]
+
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def init_schema(conn, path=SCHEMA_PATH):
+    for statement in schema_statements(path):
+        try:
+            conn.execute(statement)
+        except sqlite3.IntegrityError as e:
+            # A unique index added to the schema after this file was filled; the data has duplicates
+            print(f"Warning: skipped '{statement}': {e}. Run scripts/migrate_statement_indexes.py")
+    conn.commit()
+
+
+# --- SQL functions ------------------------------------------------------------
+
+def _md5(value):
+    if value is None:
+        return None
+    return hashlib.md5(str(value).encode("utf-8")).hexdigest()
+
+
+def _concat_ws(separator, *values):
+    # Like MySQL: NULL arguments are skipped, a NULL separator gives NULL
+    if separator is None:
+        return None
+    return str(separator).join(_text(v) for v in values if v is not None)
+
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _OrderedConcat:
+    """GROUP_CONCAT(expr ORDER BY key SEPARATOR sep)"""
+
+    def __init__(self):
+        self.items = []
+        self.separator = ","
+
+    def step(self, key, value, separator):
+        self.separator = separator
+        if value is not None:
+            self.items.append((key is None, key, _text(value)))
+
+    def finalize(self):
+        if not self.items:
+            return None
+        self.items.sort(key=lambda item: (item[0], item[1] if item[1] is not None else ""))
+        return self.separator.join(item[2] for item in self.items)
+
+
+# --- Connection / cursor ------------------------------------------------------
+
+def _driver_error(e):
+    """Re-raise sqlite3 errors as the mysql.connector error the callers catch"""
+    if isinstance(e, sqlite3.IntegrityError):
+        cls = mysql.connector.errors.IntegrityError
+    elif isinstance(e, sqlite3.OperationalError):
+        cls = mysql.connector.errors.OperationalError
+    elif isinstance(e, sqlite3.ProgrammingError):
+        cls = mysql.connector.errors.ProgrammingError
+    else:
+        cls = mysql.connector.errors.DatabaseError
+    return cls(msg=str(e))
+
+
+class SQLiteCursor:
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn._conn.cursor()
+        self._dictionary = dictionary
+        self._skipped = False
+
+    @property
+    def description(self):
+        return None if self._skipped else self._cursor.description
+
+    @property
+    def rowcount(self):
+        return 0 if self._skipped else self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, operation, params=()):
+        sql = translate(operation)
+        self._skipped = sql is None
+        if self._skipped:
+            return
+        try:
+            self._cursor.execute(sql, tuple(params) if params is not None else ())
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+
+    def executemany(self, operation, seq_params):
+        sql = translate(operation)
+        self._skipped = sql is None
+        if self._skipped:
+            return
+        try:
+            self._cursor.executemany(sql, [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((c[0] for c in self._cursor.description), row))
+
+    def fetchone(self):
+        if self._skipped:
+            return None
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        if self._skipped:
+            return []
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        if self._skipped:
+            return []
+        rows = self._cursor.fetchall()
+        if not self._dictionary:
+            return rows
+        cols = [c[0] for c in self._cursor.description]
+        return [dict(zip(cols, row)) for row in rows]
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")   # readers don't block the pipeline's writes
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.create_function("md5", 1, _md5, deterministic=True)
+        self._conn.create_function("concat_ws", -1, _concat_ws, deterministic=True)
+        self._conn.create_aggregate("ordered_concat", 3, _OrderedConcat)
+        self._closed = False
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def start_transaction(self):
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._conn.close()
+
+
+def connect(path):
+    """Open (creating and initializing on first use in this process) a SQLite database file"""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = SQLiteConnection(path)
+    key = os.path.abspath(path)
+    if key not in _initialized or path == ":memory:":
+        with _init_lock:
+            if key not in _initialized or path == ":memory:":
+                init_schema(conn._conn)
+                _initialized.add(key)
+    return conn
@@ -0,0 +1,58 @@
+# database/version.py
+#
+# A single-row data_version counter. Writers (store_results, the migration)
+# bump it in the same transaction as their data; readers in the web app
+# poll it cheaply to know when in-process indexes and caches are stale.
+
+import time
+import threading
+
+
+def bump_data_version(cursor):
+    """Increment the data version; call before committing a write"""
+    cursor.execute("""
+        INSERT INTO data_version (id, version) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """)
+
+
+def read_data_version(cursor):
+    cursor.execute("SELECT version FROM data_version WHERE id = 1")
+    row = cursor.fetchone()
+    if not row:
+        return 0
+    return row["version"] if isinstance(row, dict) else row[0]
+
+
+class DataVersionWatcher:
+    """Caches the data version, re-reading it at most every check_interval seconds"""
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self, get_connection):
+        """Return the data version; get_connection is only called when a re-check is due"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return self._version
+            self._checked_at = now
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            version = read_data_version(cursor)
+            cursor.close()
+        except Exception:
+            # Table missing or DB hiccup: keep serving what we have
+            version = self._version if self._version is not None else 0
+        with self._lock:
+            self._version = version
+        return version
+
+    def invalidate(self):
+        """Force the next current() call to re-read the version"""
+        with self._lock:
+            self._checked_at = 0.0
@@ -1,5 +1,9 @@
 -- Financial Analysis ML Database Schema
 -- Run this file to set up the MySQL database
+-- Databases created while the percentage columns of profitandloss, analysis
+-- and company_summary were VARCHAR: run scripts/migrate_numeric_columns.py
+-- Databases created with single-column company_id/year indexes on the
+-- statement tables: run scripts/migrate_statement_indexes.py
 
 -- Create database if not exists
 CREATE DATABASE IF NOT EXISTS ml_test;
@@ -27,10 +31,10 @@ CREATE TABLE IF NOT EXISTS companies (
 CREATE TABLE IF NOT EXISTS analysis (
     id VARCHAR(50) PRIMARY KEY,
     company_id VARCHAR(50) NOT NULL,
-    compounded_sales_growth VARCHAR(20),
-    compounded_profit_growth VARCHAR(20),
-    stock_price_cagr VARCHAR(20),
-    roe VARCHAR(20),
+    compounded_sales_growth DECIMAL(14,2),   -- percent, e.g. 12.34
+    compounded_profit_growth DECIMAL(14,2),
+    stock_price_cagr DECIMAL(14,2),
+    roe DECIMAL(10,2),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE
@@ -61,8 +65,7 @@ CREATE TABLE IF NOT EXISTS cashflow (
     financing_activity DECIMAL(20,2),
     net_cash_flow DECIMAL(20,2),
     FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
-    INDEX idx_cashflow_company (company_id),
-    INDEX idx_cashflow_year (year)
+    UNIQUE INDEX uq_cashflow_company_year (company_id, year)
 );
 
 -- Balance sheets for each company/year
@@ -81,8 +84,9 @@ CREATE TABLE IF NOT EXISTS balancesheet (
     other_asset DECIMAL(20,2),
     total_assets DECIMAL(20,2),
     FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
-    INDEX idx_balancesheet_company (company_id),
-    INDEX idx_balancesheet_year (year)
+    UNIQUE INDEX uq_balancesheet_company_year (company_id, year),
+    -- Covers the feature and fingerprint reads (scripts/features.py, scripts/change_detection.py)
+    INDEX idx_balancesheet_features (company_id, year, borrowings, total_liabilities)
 );
 
 -- Profit and loss for each company/year
@@ -98,13 +102,62 @@ CREATE TABLE IF NOT EXISTS profitandloss (
     interest DECIMAL(20,2),
     depreciation DECIMAL(20,2),
     profit_before_tax DECIMAL(20,2),
-    tax_percentage VARCHAR(10),
+    tax_percentage DECIMAL(10,4),
     net_profit DECIMAL(20,2),
     eps DECIMAL(20,2),
-    dividend_payout VARCHAR(20),
+    dividend_payout DECIMAL(10,4),
     FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
-    INDEX idx_profitandloss_company (company_id),
-    INDEX idx_profitandloss_year (year)
+    UNIQUE INDEX uq_profitandloss_company_year (company_id, year),
+    -- Covers the feature, fingerprint and growth reads (features.py, change_detection.py, store_results.py)
+    INDEX idx_profitandloss_features (company_id, year, sales, net_profit, dividend_payout)
+);
+
+-- Denormalized listing data for the web app (one row per company).
+-- Rebuilt by scripts/store_results.py after each store run.
+CREATE TABLE IF NOT EXISTS company_summary (
+    company_id VARCHAR(50) PRIMARY KEY,
+    company_name VARCHAR(255) NOT NULL,
+    roe_percentage DECIMAL(5,2),
+    compounded_sales_growth DECIMAL(14,2),
+    compounded_profit_growth DECIMAL(14,2),
+    pros_count INT NOT NULL DEFAULT 0,
+    cons_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
+    INDEX idx_summary_name (company_name, company_id),
+    -- "top N by growth" lists
+    INDEX idx_summary_sales_growth (compounded_sales_growth),
+    INDEX idx_summary_profit_growth (compounded_profit_growth)
+);
+
+-- Fingerprint of the source rows each company's stored results were computed
+-- from; incremental pipeline runs only re-process companies whose fingerprint changed
+CREATE TABLE IF NOT EXISTS analysis_state (
+    company_id VARCHAR(50) PRIMARY KEY,
+    fingerprint CHAR(32) NOT NULL,
+    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE
+);
+
+-- Single-row change counter, bumped whenever the pipeline or migration
+-- commits new data. The web app polls it to refresh in-process indexes/caches.
+CREATE TABLE IF NOT EXISTS data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+INSERT IGNORE INTO data_version (id, version) VALUES (1, 0);
+
+-- Migration ledger: one row per data/raw file with the content hash it was
+-- imported from, so a restarted migration skips files already done
+CREATE TABLE IF NOT EXISTS migration_checkpoints (
+    file_name VARCHAR(255) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    status VARCHAR(10) NOT NULL,            -- 'done' or 'failed'
+    companies INT NOT NULL DEFAULT 0,
+    row_count INT NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Insert sample data (optional)
@@ -114,8 +167,10 @@ CREATE TABLE IF NOT EXISTS profitandloss (
 DESCRIBE companies;
 DESCRIBE analysis;
 DESCRIBE prosandcons;
+DESCRIBE company_summary;
 
 -- Show indexes
 SHOW INDEX FROM companies;
 SHOW INDEX FROM analysis;
-SHOW INDEX FROM prosandcons; 
\ No newline at end of file
+SHOW INDEX FROM prosandcons;
+SHOW INDEX FROM company_summary; 
\ No newline at end of file
@@ -33,10 +33,10 @@ def check_data_availability():
     
     try:
         import mysql.connector
-        from config.config import DB_CONFIG
+        from database.connection import connect
         
         # Check database connection and data
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = connect()
         cursor = conn.cursor()
         
         # Check if companies table exists and has data
@@ -81,13 +81,41 @@ def check_data_availability():
     
     return True
 
-def run_pipeline():
-    """Execute the ML pipeline without data fetching"""
+def default_report_path():
+    from config.config import RUN_REPORT_DIR
+    return os.path.join(RUN_REPORT_DIR, time.strftime("run-%Y%m%d-%H%M%S.json"))
+
+def run_pipeline(full=False, retrain=False, report_path=None, profile=False):
+    """Execute the ML pipeline without data fetching.
+
+    By default only companies whose financials changed since the last run
+    are re-analyzed and re-stored; full=True rebuilds everything. The model
+    is only retrained when its training data or parameters changed, or
+    when retrain=True.
+
+    Every run writes a JSON run report (stage timings, DB statements, rows,
+    peak RSS) to report_path, by default data/reports/run-<time>.json;
+    profile=True also saves a cProfile dump of the slowest stage.
+    """
+    from scripts.instrumentation import start_run, finish_run
+    start_run("pipeline", profile=profile)
+    ok = False
+    try:
+        ok = _run_steps(full, retrain)
+    finally:
+        finish_run(report_path or default_report_path(), status="ok" if ok else "failed")
+    return ok
+
+def _run_steps(full, retrain):
+    from scripts.instrumentation import stage
+
     print("Starting Financial Analysis ML Pipeline")
     print("=" * 50)
     
     # Check data availability
-    if not check_data_availability():
+    with stage("check_data"):
+        data_ok = check_data_availability()
+    if not data_ok:
         print("Pipeline cannot proceed - missing required data in database")
         return False
     
@@ -95,7 +123,8 @@ def run_pipeline():
     print("\nStep 1: Training ML classifier...")
     try:
         from scripts.train_ml_classifier import main as train_main
-        train_main()
+        with stage("train"):
+            train_main(force=retrain)
         print("ML model training completed")
     except Exception as e:
         print(f"Error in ML training: {e}")
@@ -105,7 +134,9 @@ def run_pipeline():
     print("\nStep 2: Analyzing data with ML...")
     try:
         from scripts.analyze_data import main as analyze_main
-        analyze_main()
+        # Results are handed to the store step in memory, no files in between
+        with stage("analyze"):
+            results = analyze_main(spill_path=None, full=full)
         print("ML analysis completed")
     except Exception as e:
         print(f"Error in ML analysis: {e}")
@@ -115,7 +146,8 @@ def run_pipeline():
     print("\nStep 3: Storing results in MySQL...")
     try:
         from scripts.store_results import main as store_main
-        store_main()
+        with stage("store"):
+            store_main(results=results, full=full)
         print("Results stored in MySQL")
     except Exception as e:
         print(f"Error storing results: {e}")
@@ -146,16 +178,24 @@ if __name__ == "__main__":
                        help="Start only the web server without running the pipeline")
     parser.add_argument("--pipeline-only", action="store_true",
                        help="Run only the ML pipeline without starting the web server")
+    parser.add_argument("--full", action="store_true",
+                       help="Re-analyze and re-store every company instead of only changed ones")
+    parser.add_argument("--retrain", action="store_true",
+                       help="Retrain the ML model even if the cached one is up to date")
+    parser.add_argument("--report", metavar="PATH", default=None,
+                       help="Where to write the JSON run report (default: data/reports/run-<time>.json)")
+    parser.add_argument("--profile", action="store_true",
+                       help="Profile each pipeline stage with cProfile and save the slowest stage's profile")
     
     args = parser.parse_args()
     
     if args.web_only:
         start_web_server()
     elif args.pipeline_only:
-        run_pipeline()
+        run_pipeline(full=args.full, retrain=args.retrain, report_path=args.report, profile=args.profile)
     else:
         # Run pipeline first, then start web server
-        if run_pipeline():
+        if run_pipeline(full=args.full, retrain=args.retrain, report_path=args.report, profile=args.profile):
             print("\nStarting web server in 3 seconds...")
             time.sleep(3)
             start_web_server()
\ No newline at end of file
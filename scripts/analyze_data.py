@@ -2,69 +2,44 @@
 
 import os
 import sys
+import copy
 import json
-import mysql.connector
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config.config import DB_CONFIG
+from config.config import RESULTS_SPILL_PATH, MODEL_PATH
+from database.connection import connect
+from scripts.change_detection import find_dirty_companies, model_fingerprint
+from scripts.instrumentation import stage
+from scripts.classifier import load_classifier, predictions_to_text
+from scripts.features import FEATURE_COLS, compute_features, frames_from_company_data, load_feature_frames
 
 PROCESSED_DATA_PATH = "data/processed"
 os.makedirs(PROCESSED_DATA_PATH, exist_ok=True)
 
-def safe_float(val):
-    try:
-        return float(val)
-    except:
-        return 0.0
+# Error slot of an analyze_companies result for a company id without a companies row
+NOT_FOUND = object()
 
 def evaluate_metrics_ml(data, clf):
-    roe = safe_float(data["company"].get("roe_percentage"))
-    # Dividend payout: latest nonzero
-    dividend_payout = 0
-    for pl in reversed(data["data"].get("profitandloss", [])):
-        payout = safe_float(pl.get("dividend_payout"))
-        if payout > 0:
-            dividend_payout = payout
-            break
-    # Sales growth (last 5 years)
-    sales_data = data["data"].get("profitandloss", [])[-6:]
-    sales_growth = 0
-    if len(sales_data) >= 2:
-        first = safe_float(sales_data[0].get("sales"))
-        last = safe_float(sales_data[-1].get("sales"))
-        if first > 0:
-            sales_growth = ((last - first) / first) * 100
-    # Debt ratio (latest year)
-    bs = data["data"].get("balancesheet", [])
-    debt_ratio = 0
-    if bs:
-        latest = bs[-1]
-        borrowings = safe_float(latest.get("borrowings"))
-        total_liabilities = safe_float(latest.get("total_liabilities"))
-        debt_ratio = (borrowings / total_liabilities) if total_liabilities else 0
+    company_id = data["company"].get("id")
+    features = compute_features(*frames_from_company_data({company_id: data}))
     # Predict pros
-    X = [[roe, dividend_payout, sales_growth, debt_ratio]]
-    preds = clf.predict(X)[0]
-    pros = []
-    cons = []
-    # Map predictions to text (same as before)
-    if preds[0]:
-        pros.append(f"Company has a good ROE track record: 3 Years ROE {roe:.1f}%")
-    else:
-        cons.append(f"Company has a low return on equity of {roe:.1f}% over last 3 years.")
-    if preds[1]:
-        pros.append(f"Company has maintained a healthy dividend payout of {dividend_payout:.1f}%")
-    else:
-        cons.append("Company is not paying out dividend.")
-    if preds[2]:
-        pros.append(f"Company has shown strong sales growth of {sales_growth:.2f}% over last 5 years")
-    else:
-        cons.append(f"Company has delivered poor sales growth of {sales_growth:.2f}% over last 5 years")
-    if preds[3]:
-        pros.append("Company is almost debt-free.")
-    elif debt_ratio > 0.5:
-        cons.append("Company has high debt levels compared to liabilities.")
-    return pros[:3], cons[:3]
+    preds = clf.predict(features[FEATURE_COLS])[0]
+    return predictions_to_text(features[FEATURE_COLS].to_numpy()[0], preds)
+
+def evaluate_metrics_ml_batch(X, clf):
+    """Score a whole feature matrix with a single clf.predict call.
+
+    X is a DataFrame (or matrix) of FEATURE_COLS rows, see scripts/features.py;
+    returns a (pros, cons) tuple per row, in the same order.
+    """
+    if len(X) == 0:
+        return []
+    preds = clf.predict(X)
+    rows = X.to_numpy() if hasattr(X, "to_numpy") else X
+    return [predictions_to_text(features, row_preds) for features, row_preds in zip(rows, preds)]
 
 def fetch_company_data_from_db(cursor, company_id):
     # Get company info
@@ -87,35 +62,168 @@ def fetch_company_data_from_db(cursor, company_id):
     }
     return {'company': company_dict, 'data': data_dict}
 
+def write_results_spill(results, path=RESULTS_SPILL_PATH):
+    """Write all results once as JSON Lines (one company per line) for standalone store runs"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out_f:
+        for result in results:
+            out_f.write(json.dumps(result, ensure_ascii=False))
+            out_f.write("\n")
+    os.replace(tmp_path, path)
+
 
-def main():
-    import joblib
-    db = mysql.connector.connect(**DB_CONFIG)
+def analyze_companies(cursor, clf, company_ids=None):
+    """Bulk-load and score a set of companies (all of them by default).
+
+    Returns (company_id, pros, cons, error) tuples in company order; error is
+    None on success, NOT_FOUND for an unknown company id, else a message. If
+    the batched predict fails, companies are scored one by one so a single
+    bad row only fails that company.
+    """
+    with stage("load_features"):
+        frames = load_feature_frames(cursor, company_ids)
+    with stage("compute_features"):
+        features = compute_features(*frames)
+    X = features[FEATURE_COLS]
+    scored = {}
+    try:
+        with stage("predict"):
+            for company_id, (pros, cons) in zip(features.index, evaluate_metrics_ml_batch(X, clf)):
+                scored[company_id] = (company_id, pros, cons, None)
+    except Exception:
+        for i, company_id in enumerate(features.index):
+            try:
+                pros, cons = evaluate_metrics_ml_batch(X.iloc[i:i + 1], clf)[0]
+                scored[company_id] = (company_id, pros, cons, None)
+            except Exception as e:
+                scored[company_id] = (company_id, None, None, f"{type(e).__name__}: {e}")
+    if company_ids is None:
+        return list(scored.values())
+    return [scored.get(company_id, (company_id, None, None, NOT_FOUND)) for company_id in company_ids]
+
+# Per-thread connection and classifier copy for --workers mode
+_worker = threading.local()
+_worker_connections = []
+_worker_lock = threading.Lock()
+
+def _init_worker(clf):
+    _worker.db = connect()
+    _worker.clf = copy.deepcopy(clf)
+    with _worker_lock:
+        _worker_connections.append(_worker.db)
+
+def _analyze_chunk(company_ids):
+    cursor = _worker.db.cursor()
+    try:
+        return analyze_companies(cursor, _worker.clf, company_ids)
+    finally:
+        cursor.close()
+
+def analyze_parallel(cursor, clf, workers, company_ids=None):
+    """Split company ids across a thread pool, each thread with its own connection"""
+    if company_ids is None:
+        cursor.execute("SELECT id FROM companies")
+        company_ids = [row[0] for row in cursor.fetchall()]
+    all_company_ids = list(company_ids)
+    # A few chunks per worker keeps the pool busy when chunks finish unevenly
+    chunk_size = max(1, -(-len(all_company_ids) // (workers * 4)))
+    chunks = [all_company_ids[i:i + chunk_size] for i in range(0, len(all_company_ids), chunk_size)]
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(clf,)) as pool:
+            futures = [pool.submit(_analyze_chunk, chunk) for chunk in chunks]
+            # Collect in submission order; a failed chunk only fails its own companies
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    results.extend((company_id, None, None, f"{type(e).__name__}: {e}") for company_id in chunk)
+    finally:
+        with _worker_lock:
+            for conn in _worker_connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            _worker_connections.clear()
+    return results
+
+
+def main(bulk=True, workers=1, spill_path=RESULTS_SPILL_PATH, full=False):
+    """Analyze companies and return [{'company_id', 'pros', 'cons', 'fingerprint'}] results.
+
+    Only companies whose source rows (or the model) changed since their
+    results were last stored are analyzed, unless full=True.
+
+    The results are also written to spill_path (JSON Lines) so that
+    store_results.py can run as a separate process; pass spill_path=None
+    when handing the results to store_results.main directly.
+    """
+    start = time.perf_counter()
+    db = connect()
     cursor = db.cursor()
-    clf = joblib.load("ml_pros_classifier.joblib")
-    cursor.execute("SELECT id FROM companies")
-    all_company_ids = [row[0] for row in cursor.fetchall()]
-    for company_id in all_company_ids:
-        try:
-            full_data = fetch_company_data_from_db(cursor, company_id)
-            if not full_data:
+    with stage("load_model"):
+        clf = load_classifier()
+
+    # Change detection: fingerprints of the rows each company is analyzed from
+    with stage("change_detection"):
+        dirty_ids, fingerprints = find_dirty_companies(cursor, model_fingerprint(MODEL_PATH))
+    if full:
+        company_ids = list(fingerprints)
+    else:
+        company_ids = dirty_ids
+        print(f"{len(dirty_ids)} of {len(fingerprints)} companies changed since the last stored run")
+
+    results = []
+    if bulk or workers > 1:
+        if workers > 1:
+            with stage("analyze_parallel"):
+                scored = analyze_parallel(cursor, clf, workers, company_ids)
+        else:
+            scored = analyze_companies(cursor, clf, company_ids)
+        for company_id, pros, cons, error in scored:
+            if error is NOT_FOUND:
                 print(f"Skipping {company_id}: not found in DB.")
                 continue
-            pros, cons = evaluate_metrics_ml(full_data, clf)
-            result = {
-                "company_id": company_id,
-                "pros": pros,
-                "cons": cons
-            }
-            # Optionally write to processed file (or could be inserted into DB later)
-            out_path = os.path.join(PROCESSED_DATA_PATH, f"{company_id}.json")
-            with open(out_path, "w", encoding="utf-8") as out_f:
-                json.dump(result, out_f, indent=4)
+            if error:
+                print(f"Error processing {company_id}: {error}")
+                continue
+            results.append({"company_id": company_id, "pros": pros, "cons": cons,
+                            "fingerprint": fingerprints.get(company_id)})
             print(f"Analyzed: {company_id}")
-        except Exception as e:
-            print(f"Error processing {company_id}: {type(e).__name__}: {e}")
+    else:
+        for company_id in company_ids:
+            try:
+                full_data = fetch_company_data_from_db(cursor, company_id)
+                if not full_data:
+                    print(f"Skipping {company_id}: not found in DB.")
+                    continue
+                pros, cons = evaluate_metrics_ml(full_data, clf)
+                results.append({"company_id": company_id, "pros": pros, "cons": cons,
+                                "fingerprint": fingerprints.get(company_id)})
+                print(f"Analyzed: {company_id}")
+            except Exception as e:
+                print(f"Error processing {company_id}: {type(e).__name__}: {e}")
     cursor.close()
     db.close()
+    if spill_path:
+        with stage("write_spill"):
+            write_results_spill(results, spill_path)
+        print(f"Results written to {spill_path}")
+    elapsed = time.perf_counter() - start
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"Analyzed {len(results)} companies in {elapsed:.2f}s ({rate:.1f} companies/sec)")
+    return results
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyze companies with the ML classifier")
+    parser.add_argument("--per-company", action="store_true",
+                        help="Query the database once per company instead of bulk loading")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Analyze companies across N threads, each with its own DB connection")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-analyze every company, not only those whose data changed")
+    args = parser.parse_args()
+    main(bulk=not args.per_company, workers=args.workers, full=args.full)
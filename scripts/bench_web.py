@@ -0,0 +1,103 @@
+# scripts/bench_web.py
+#
+# Page latency benchmark for the Flask app: runs the same requests with
+# pooling disabled (one new MySQL connection per request, the old
+# behaviour) and with the configured connection pool, and prints p50/p99.
+#
+# The app's response caches (company pages, processed count, series) are
+# turned off for the whole benchmark and the search index is rebuilt at the
+# start of each mode, so both modes do the same database work and the
+# difference is the connection handling, not cache hits.
+#
+# Usage:
+#     python scripts/bench_web.py --requests 200
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.config import DB_CONFIG, DB_POOL_CONFIG
+from database.pool import ConnectionPool
+from web.search_index import SearchIndexHolder
+from web.screener import ScreenerHolder
+import web.app as web_app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def default_paths():
+    """Routes to hit; uses the first listed company for the detail page"""
+    conn = web_app.db_pool.acquire()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, company_name FROM companies ORDER BY company_name LIMIT 1")
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    paths = ["/", "/companies?page=2", "/search?q=bank"]
+    if row:
+        paths.append(f"/company/{row[0]}")
+    return paths
+
+
+def disable_caches():
+    """TTL 0: every cached entry is expired by the time it is read"""
+    for cache in (web_app.page_cache, web_app.count_cache, web_app.series_cache):
+        cache.ttl = 0
+        cache.clear()
+
+
+def reset_indexes():
+    """Drop the in-memory search index and screener snapshot so the next mode loads them itself"""
+    web_app.search_index = SearchIndexHolder()
+    web_app.screener = ScreenerHolder()
+
+
+def run(client, paths, n_requests):
+    timings = {path: [] for path in paths}
+    for _ in range(n_requests):
+        for path in paths:
+            start = time.perf_counter()
+            resp = client.get(path)
+            timings[path].append((time.perf_counter() - start) * 1000)
+            if resp.status_code >= 500:
+                print(f"  {path} returned {resp.status_code}")
+    return timings
+
+
+def report(label, timings):
+    print(f"\n{label}")
+    print(f"  {'route':<28}{'p50 ms':>10}{'p99 ms':>10}")
+    for path, samples in timings.items():
+        print(f"  {path:<28}{percentile(samples, 50):>10.1f}{percentile(samples, 99):>10.1f}")
+
+
+def main(n_requests=100):
+    client = web_app.app.test_client()
+    paths = default_paths()
+    web_app.db_pool.close_all()
+    disable_caches()
+
+    reset_indexes()
+    web_app.db_pool = ConnectionPool(DB_CONFIG, **dict(DB_POOL_CONFIG, pool_size=0))
+    report("Without pool (new connection per request)", run(client, paths, n_requests))
+
+    reset_indexes()
+    web_app.db_pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+    client.get(paths[0])  # warm up one pooled connection
+    report(f"With pool (pool_size={DB_POOL_CONFIG['pool_size']})", run(client, paths, n_requests))
+    web_app.db_pool.close_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark web page latency with and without connection pooling")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per route for each mode")
+    args = parser.parse_args()
+    main(args.requests)
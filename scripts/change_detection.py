@@ -0,0 +1,91 @@
+# scripts/change_detection.py
+#
+# Per-company fingerprints of the source rows the pipeline reads, so that
+# incremental runs only re-analyze and re-store companies whose financials
+# (or the model) changed since their results were last stored.
+#
+# Fingerprints are computed inside MySQL (one GROUP BY query per table,
+# 32 bytes per company over the wire) and kept in the analysis_state table.
+
+import hashlib
+
+from config.config import MODEL_PATH
+
+# Per-table digest of the columns analysis and storage depend on.
+# COALESCE keeps NULL distinguishable from a missing row.
+FINGERPRINT_QUERIES = {
+    'companies': """
+        SELECT id, MD5(CONCAT_WS('|', COALESCE(company_name, ''), COALESCE(roe_percentage, '')))
+        FROM companies
+    """,
+    'profitandloss': """
+        SELECT company_id, MD5(GROUP_CONCAT(
+            CONCAT_WS('|', year, COALESCE(sales, ''), COALESCE(net_profit, ''), COALESCE(dividend_payout, ''))
+            ORDER BY year SEPARATOR ';'))
+        FROM profitandloss GROUP BY company_id
+    """,
+    'balancesheet': """
+        SELECT company_id, MD5(GROUP_CONCAT(
+            CONCAT_WS('|', year, COALESCE(borrowings, ''), COALESCE(total_liabilities, ''))
+            ORDER BY year SEPARATOR ';'))
+        FROM balancesheet GROUP BY company_id
+    """,
+}
+
+
+def _values(row):
+    """Row as a tuple, for plain and dictionary cursors alike"""
+    return tuple(row.values()) if isinstance(row, dict) else tuple(row)
+
+
+def model_fingerprint(model_path=MODEL_PATH):
+    """Hash of the model artifact; a new model makes every company dirty"""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_fingerprints(cursor, model_key=""):
+    """{company_id: fingerprint} for every company, from the current source rows"""
+    # GROUP_CONCAT truncates at 1024 bytes by default
+    cursor.execute("SET SESSION group_concat_max_len = 1048576")
+    digests = {}
+    for table, query in FINGERPRINT_QUERIES.items():
+        cursor.execute(query)
+        for row in cursor.fetchall():
+            company_id, table_digest = _values(row)
+            digests.setdefault(company_id, {})[table] = table_digest or ""
+    fingerprints = {}
+    for company_id, parts in digests.items():
+        if 'companies' not in parts:
+            continue  # statement rows for a company that no longer exists
+        raw = "|".join([model_key] + [parts.get(table, "") for table in FINGERPRINT_QUERIES])
+        fingerprints[company_id] = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return fingerprints
+
+
+def load_stored_fingerprints(cursor):
+    cursor.execute("SELECT company_id, fingerprint FROM analysis_state")
+    return dict(_values(row) for row in cursor.fetchall())
+
+
+def find_dirty_companies(cursor, model_key=""):
+    """Return (dirty company ids, current fingerprints)"""
+    current = compute_fingerprints(cursor, model_key)
+    stored = load_stored_fingerprints(cursor)
+    dirty = [company_id for company_id, fingerprint in current.items() if stored.get(company_id) != fingerprint]
+    return dirty, current
+
+
+def save_fingerprints(cursor, fingerprints, batch_size=500):
+    """Record fingerprints of stored companies (same transaction as the results)"""
+    items = list(fingerprints.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        cursor.execute(
+            "INSERT INTO analysis_state (company_id, fingerprint) VALUES "
+            + ", ".join(["(%s, %s)"] * len(batch))
+            + " ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint), analyzed_at = CURRENT_TIMESTAMP",
+            [value for item in batch for value in item])
@@ -0,0 +1,225 @@
+# scripts/check_query_plans.py
+#
+# EXPLAINs the statements the pipeline and the web app run and fails (exit
+# status 1) when one of them scans a whole table it is not meant to read in
+# full: MySQL access type ALL or index, SQLite "SCAN <table>". Sorts that
+# don't come from an index (filesort / temp B-tree) are listed as notes.
+#
+#     python scripts/check_query_plans.py            # DB_BACKEND picks MySQL or SQLite
+#     python scripts/check_query_plans.py --verbose  # print every plan
+#
+# Run it against a database holding realistic data: on tiny tables MySQL
+# may prefer a scan even when a usable index exists. When a query changes
+# in the code, change it in build_queries() too.
+
+import os
+import re
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.config import DB_BACKEND
+from database.connection import connect
+from scripts.change_detection import FINGERPRINT_QUERIES
+from scripts.features import FEATURE_COLUMNS
+from web.screener import SNAPSHOT_QUERY
+from web.series import SERIES_FIELDS
+
+LISTING_COLUMNS = """company_id, company_name, roe_percentage, compounded_sales_growth,
+    compounded_profit_growth, pros_count, cons_count"""
+
+SUMMARY_REFRESH = """
+    INSERT INTO company_summary (company_id, company_name, roe_percentage, compounded_sales_growth, compounded_profit_growth, pros_count, cons_count)
+    SELECT c.id, c.company_name, c.roe_percentage,
+           a.compounded_sales_growth, a.compounded_profit_growth,
+           (SELECT COUNT(p.pros) FROM prosandcons p WHERE p.company_id = c.id),
+           (SELECT COUNT(p.cons) FROM prosandcons p WHERE p.company_id = c.id)
+    FROM companies c
+    LEFT JOIN analysis a ON a.id = (
+        SELECT a2.id FROM analysis a2 WHERE a2.company_id = c.id
+        ORDER BY a2.updated_at DESC, a2.id LIMIT 1
+    )
+    {where}
+    ON DUPLICATE KEY UPDATE company_name=VALUES(company_name), roe_percentage=VALUES(roe_percentage),
+        compounded_sales_growth=VALUES(compounded_sales_growth), compounded_profit_growth=VALUES(compounded_profit_growth),
+        pros_count=VALUES(pros_count), cons_count=VALUES(cons_count)
+"""
+
+
+def build_queries(sample):
+    """[(source, sql, params, scans)] where scans are the tables the statement may read end to end.
+
+    sample holds an existing company's id and name and a few ids for the IN
+    lists, so the planner sees realistic values.
+    """
+    company_id, company_name, ids = sample["id"], sample["name"], sample["ids"]
+    in_list = ", ".join(["%s"] * len(ids))
+    queries = [
+        ("main.check_data_availability", "SELECT COUNT(*) FROM companies", (), {"companies"}),
+        ("main.check_data_availability", "SELECT COUNT(DISTINCT company_id) FROM profitandloss", (),
+         {"profitandloss"}),
+        ("version.read_data_version", "SELECT version FROM data_version WHERE id = 1", (), set()),
+        ("change_detection.load_stored_fingerprints", "SELECT company_id, fingerprint FROM analysis_state", (),
+         {"analysis_state"}),
+        ("analyze_data.main", "SELECT id FROM companies", (), {"companies"}),
+        ("analyze_data.fetch_company_data_from_db", "SELECT * FROM companies WHERE id=%s", (company_id,), set()),
+        ("generate_training_data.main", "SELECT company_id, pros FROM prosandcons", (), {"prosandcons"}),
+    ]
+    for table, query in FINGERPRINT_QUERIES.items():
+        queries.append((f"change_detection.compute_fingerprints[{table}]", query, (), {table}))
+    for table in ("cashflow", "balancesheet", "profitandloss"):
+        queries.append(("analyze_data.fetch_company_data_from_db",
+                        f"SELECT * FROM {table} WHERE company_id=%s ORDER BY year", (company_id,), set()))
+
+    # Feature frames: every company (pipeline) and a subset (incremental runs, /api/score)
+    queries.append(("features.load_feature_frames[all]",
+                    f"SELECT {', '.join(FEATURE_COLUMNS['companies'])} FROM companies", (), {"companies"}))
+    queries.append(("features.load_feature_frames[subset]",
+                    f"SELECT {', '.join(FEATURE_COLUMNS['companies'])} FROM companies WHERE id IN ({in_list})",
+                    ids, set()))
+    for table in ("profitandloss", "balancesheet"):
+        columns = ', '.join(FEATURE_COLUMNS[table])
+        queries.append(("features.load_feature_frames[all]",
+                        f"SELECT {columns} FROM {table} ORDER BY company_id, year", (), {table}))
+        queries.append(("features.load_feature_frames[subset]",
+                        f"SELECT {columns} FROM {table} WHERE company_id IN ({in_list}) ORDER BY company_id, year",
+                        ids, set()))
+
+    queries += [
+        ("store_results.fetch_profitandloss_from_db",
+         "SELECT * FROM profitandloss WHERE company_id = %s ORDER BY year", (company_id,), set()),
+        ("store_results.store_results_bulk",
+         f"SELECT id, roe_percentage FROM companies WHERE id IN ({in_list})", ids, set()),
+        ("store_results.store_results_bulk",
+         f"SELECT company_id, year, sales, net_profit FROM profitandloss WHERE company_id IN ({in_list}) "
+         "ORDER BY company_id, year", ids, set()),
+        ("store_results.store_results_bulk", f"DELETE FROM prosandcons WHERE company_id IN ({in_list})", ids, set()),
+        ("store_results.refresh_company_summary[subset]",
+         SUMMARY_REFRESH.format(where=f"WHERE c.id IN ({in_list})"), ids, set()),
+        ("store_results.refresh_company_summary[all]",
+         SUMMARY_REFRESH.format(where="WHERE 1 = 1"), (), {"companies"}),
+    ]
+
+    # Web app. Listing pages walk idx_summary_name in order and stop at the LIMIT
+    queries += [
+        ("web.render_company_listing[page]",
+         f"SELECT {LISTING_COLUMNS} FROM company_summary ORDER BY company_name, company_id LIMIT %s OFFSET %s",
+         (25, 24), {"company_summary"}),
+        ("web.render_company_listing[after]",
+         f"SELECT {LISTING_COLUMNS} FROM company_summary "
+         "WHERE company_name >= %s AND (company_name > %s OR company_id > %s) "
+         "ORDER BY company_name, company_id LIMIT %s",
+         (company_name, company_name, company_id, 25), set()),
+        ("web.render_company_listing[before]",
+         f"SELECT {LISTING_COLUMNS} FROM company_summary "
+         "WHERE company_name <= %s AND (company_name < %s OR company_id < %s) "
+         "ORDER BY company_name DESC, company_id DESC LIMIT %s",
+         (company_name, company_name, company_id, 25), set()),
+        ("web.render_company_listing", "SELECT COUNT(*) FROM company_summary", (), {"company_summary"}),
+        ("web.search", f"SELECT {LISTING_COLUMNS} FROM company_summary WHERE company_id IN ({in_list})", ids, set()),
+        ("web.load_search_rows", "SELECT id, company_name, about_company FROM companies", (), {"companies"}),
+        ("web.company", "SELECT * FROM companies WHERE id = %s", (company_id,), set()),
+        ("web.company", "SELECT * FROM analysis WHERE company_id = %s", (company_id,), set()),
+        ("web.company", "SELECT pros, cons FROM prosandcons WHERE company_id = %s", (company_id,), set()),
+        ("web.get_processed_count", "SELECT COUNT(DISTINCT company_id) as count FROM prosandcons", (),
+         {"prosandcons"}),
+        ("web.load_screener_rows", SNAPSHOT_QUERY, (), {"company_summary"}),
+        ("web.company_series", "SELECT id FROM companies WHERE id = %s", (company_id,), set()),
+    ]
+    for table, fields in SERIES_FIELDS.items():
+        queries.append(("series.load_series",
+                        f"SELECT year, {', '.join(fields)} FROM {table} WHERE company_id = %s ORDER BY year",
+                        (company_id,), set()))
+    return queries
+
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_NOT_ALIAS = {"where", "on", "join", "left", "right", "inner", "group", "order", "limit", "set", "values"}
+
+
+def table_aliases(sql):
+    """{name as it appears in plans: table} for the tables a statement names"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIAS:
+            aliases[alias] = table
+    return aliases
+
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def explain(cursor, sql, params):
+    """(scanned tables or aliases, sort notes, plan lines) for one statement"""
+    scanned, sorts, lines = [], [], []
+    if DB_BACKEND == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        for row in cursor.fetchall():
+            detail = row[-1]
+            lines.append(detail)
+            match = _SQLITE_SCAN.match(detail)
+            if match:
+                scanned.append(match.group(1))
+            if "TEMP B-TREE" in detail:
+                sorts.append(detail)
+        return scanned, sorts, lines
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [c[0] for c in cursor.description]
+    for values in cursor.fetchall():
+        row = dict(zip(columns, values))
+        lines.append(", ".join(f"{k}={v}" for k, v in row.items() if v is not None))
+        if row.get("type") in ("ALL", "index"):
+            scanned.append(row.get("table"))
+        extra = row.get("Extra") or ""
+        if "filesort" in extra or "temporary" in extra:
+            sorts.append(f"{row.get('table')}: {extra}")
+    return scanned, sorts, lines
+
+
+def load_sample(cursor):
+    cursor.execute("SELECT company_id, company_name FROM company_summary ORDER BY company_name, company_id LIMIT 3")
+    rows = cursor.fetchall()
+    if not rows:
+        cursor.execute("SELECT id, company_name FROM companies ORDER BY id LIMIT 3")
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+    return {"id": rows[0][0], "name": rows[0][1], "ids": [row[0] for row in rows]}
+
+
+def main(verbose=False):
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        sample = load_sample(cursor)
+        if sample is None:
+            print("No companies in the database; load data before checking query plans.")
+            return 1
+        failures = 0
+        for source, sql, params, scans in build_queries(sample):
+            scanned, sorts, lines = explain(cursor, sql, params)
+            aliases = table_aliases(sql)
+            # Names that aren't tables (derived tables, subquery aliases) are not table scans
+            full_scans = sorted({aliases[name] for name in scanned if name in aliases} - set(scans))
+            status = "FULL SCAN " + ", ".join(full_scans) if full_scans else "ok"
+            failures += bool(full_scans)
+            print(f"{status:<28} {source}: {' '.join(sql.split())[:90]}")
+            for note in sorts:
+                print(f"{'':<28}   sort: {note}")
+            if verbose or full_scans:
+                for line in lines:
+                    print(f"{'':<28}   | {line}")
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"\n{failures} statement(s) with unexpected full scans" if failures else "\nNo unexpected full scans.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EXPLAIN the pipeline and web queries and flag full scans")
+    parser.add_argument("--verbose", action="store_true", help="Print the plan of every statement")
+    args = parser.parse_args()
+    sys.exit(main(verbose=args.verbose))
@@ -0,0 +1,46 @@
+# scripts/classifier.py
+#
+# Loading the pros classifier and turning its predictions into pros/cons
+# text. Shared by the batch pipeline (analyze_data) and the web process
+# (web/scoring.py); importing it has no side effects.
+
+import json
+
+from config.config import MODEL_PATH, MODEL_META_PATH, FLAT_MODEL_DIR
+from scripts.flat_forest import FlatForest, load_flat_meta
+
+def load_classifier():
+    """The flat NumPy forest when it was exported from the current model, else the joblib model"""
+    try:
+        with open(MODEL_META_PATH, "r", encoding="utf-8") as f:
+            model_key = json.load(f).get("key")
+    except (FileNotFoundError, json.JSONDecodeError):
+        model_key = None
+    flat_meta = load_flat_meta(FLAT_MODEL_DIR)
+    if model_key and flat_meta and flat_meta.get("key") == model_key:
+        return FlatForest.load(FLAT_MODEL_DIR)
+    import joblib
+    return joblib.load(MODEL_PATH)
+
+def predictions_to_text(features, preds):
+    roe, dividend_payout, sales_growth, debt_ratio = features
+    pros = []
+    cons = []
+    # Map predictions to text (same as before)
+    if preds[0]:
+        pros.append(f"Company has a good ROE track record: 3 Years ROE {roe:.1f}%")
+    else:
+        cons.append(f"Company has a low return on equity of {roe:.1f}% over last 3 years.")
+    if preds[1]:
+        pros.append(f"Company has maintained a healthy dividend payout of {dividend_payout:.1f}%")
+    else:
+        cons.append("Company is not paying out dividend.")
+    if preds[2]:
+        pros.append(f"Company has shown strong sales growth of {sales_growth:.2f}% over last 5 years")
+    else:
+        cons.append(f"Company has delivered poor sales growth of {sales_growth:.2f}% over last 5 years")
+    if preds[3]:
+        pros.append("Company is almost debt-free.")
+    elif debt_ratio > 0.5:
+        cons.append("Company has high debt levels compared to liabilities.")
+    return pros[:3], cons[:3]
@@ -0,0 +1,115 @@
+# scripts/features.py
+#
+# Shared feature engine for training-data generation and analysis.
+# Features are computed for every company at once over pandas columns, so
+# training (generate_training_data) and inference (analyze_data) always use
+# exactly the same rules.
+
+import pandas as pd
+
+FEATURE_COLS = ["roe", "dividend_payout", "sales_growth", "debt_ratio"]
+
+# Columns the features read, per table
+FEATURE_COLUMNS = {
+    'companies': ['id', 'roe_percentage'],
+    'profitandloss': ['company_id', 'year', 'sales', 'dividend_payout'],
+    'balancesheet': ['company_id', 'year', 'borrowings', 'total_liabilities'],
+}
+
+# Number of P&L rows used for the 5-year sales growth (first and last of these)
+SALES_GROWTH_ROWS = 6
+
+
+def _fetch_frame(cursor, query, params=()):
+    cursor.execute(query, params)
+    cols = [c[0] for c in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=cols)
+
+
+def load_feature_frames(cursor, company_ids=None):
+    """Read the feature columns of companies, profitandloss and balancesheet.
+
+    One query per table, statement rows ordered by company_id, year. Pass
+    company_ids to restrict the load to a subset of companies.
+    """
+    where_company = where_id = ""
+    params = ()
+    if company_ids is not None:
+        company_ids = list(company_ids)
+        if not company_ids:
+            return (pd.DataFrame(columns=FEATURE_COLUMNS['companies']),
+                    pd.DataFrame(columns=FEATURE_COLUMNS['profitandloss']),
+                    pd.DataFrame(columns=FEATURE_COLUMNS['balancesheet']))
+        placeholders = ', '.join(['%s'] * len(company_ids))
+        where_id = f" WHERE id IN ({placeholders})"
+        where_company = f" WHERE company_id IN ({placeholders})"
+        params = tuple(company_ids)
+    companies = _fetch_frame(
+        cursor, f"SELECT {', '.join(FEATURE_COLUMNS['companies'])} FROM companies{where_id}", params)
+    frames = [companies]
+    for table in ('profitandloss', 'balancesheet'):
+        frames.append(_fetch_frame(
+            cursor,
+            f"SELECT {', '.join(FEATURE_COLUMNS[table])} FROM {table}{where_company} ORDER BY company_id, year",
+            params))
+    return tuple(frames)
+
+
+def frames_from_company_data(company_data):
+    """Build feature frames from {company_id: {'company': ..., 'data': ...}} dicts."""
+    companies = []
+    tables = {'profitandloss': [], 'balancesheet': []}
+    for company_id, data in company_data.items():
+        companies.append({'id': company_id, 'roe_percentage': data["company"].get("roe_percentage")})
+        for table, rows in tables.items():
+            for row in data["data"].get(table, []):
+                rows.append({col: (company_id if col == 'company_id' else row.get(col))
+                             for col in FEATURE_COLUMNS[table]})
+    return (pd.DataFrame(companies, columns=FEATURE_COLUMNS['companies']),
+            pd.DataFrame(tables['profitandloss'], columns=FEATURE_COLUMNS['profitandloss']),
+            pd.DataFrame(tables['balancesheet'], columns=FEATURE_COLUMNS['balancesheet']))
+
+
+def _numeric(series):
+    """Column-wise float conversion: anything that is not a number becomes 0.0"""
+    return pd.to_numeric(series, errors="coerce").astype(float).fillna(0.0)
+
+
+def compute_features(companies, profitandloss, balancesheet):
+    """Compute the four model features for every company.
+
+    Statement frames must be ordered by year within each company. Returns a
+    DataFrame indexed by company_id (in the order of `companies`) with
+    FEATURE_COLS as columns.
+    """
+    index = pd.Index(companies["id"], name="company_id")
+    features = pd.DataFrame(index=index, columns=FEATURE_COLS, dtype=float)
+
+    # ROE straight from the company row
+    features["roe"] = _numeric(companies["roe_percentage"]).to_numpy()
+
+    # Dividend payout: latest nonzero
+    payout = _numeric(profitandloss["dividend_payout"])
+    paying = payout > 0
+    latest_payout = payout[paying].groupby(profitandloss["company_id"][paying], sort=False).last()
+    features["dividend_payout"] = latest_payout.reindex(index).fillna(0.0).to_numpy()
+
+    # Sales growth (last 5 years): first vs last of the latest 6 P&L rows
+    recent = profitandloss.groupby("company_id", sort=False).tail(SALES_GROWTH_ROWS)
+    sales = _numeric(recent["sales"]).groupby(recent["company_id"], sort=False)
+    first = sales.first().reindex(index).fillna(0.0)
+    last = sales.last().reindex(index).fillna(0.0)
+    count = sales.size().reindex(index).fillna(0)
+    has_growth = (count >= 2) & (first > 0)
+    growth = ((last - first) / first.where(has_growth, 1.0)) * 100
+    features["sales_growth"] = growth.where(has_growth, 0.0).to_numpy()
+
+    # Debt ratio (latest balance sheet)
+    latest = balancesheet.groupby("company_id", sort=False).tail(1).set_index("company_id")
+    borrowings = _numeric(latest["borrowings"]).reindex(index).fillna(0.0)
+    total_liabilities = _numeric(latest["total_liabilities"]).reindex(index).fillna(0.0)
+    has_liabilities = total_liabilities != 0
+    ratio = borrowings / total_liabilities.where(has_liabilities, 1.0)
+    features["debt_ratio"] = ratio.where(has_liabilities, 0.0).to_numpy()
+
+    return features
@@ -0,0 +1,219 @@
+# scripts/flat_forest.py
+#
+# Export of the fitted RandomForestClassifier as flat NumPy arrays (one .npy
+# file each, memory-mappable) plus a small pure-NumPy evaluator whose
+# predict()/predict_proba() give the same output as scikit-learn's.
+#
+# Loading is a handful of np.load(mmap_mode="r") calls instead of unpickling
+# the forest and importing scikit-learn, and every process that maps the
+# same files shares one copy of the model in the page cache.
+#
+# Usage:
+#     python scripts/flat_forest.py --check   # export, compare with joblib model, time both
+
+import os
+import sys
+import json
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.config import MODEL_PATH, MODEL_META_PATH, FLAT_MODEL_DIR
+
+# Node arrays are concatenated over all trees; child indices are global.
+# Leaves point to themselves so traversal can run a fixed number of steps.
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "missing_left", "value", "roots", "classes", "n_classes")
+
+
+def flatten_forest(clf):
+    """(arrays, meta) for a fitted RandomForestClassifier, without touching disk"""
+    trees = [estimator.tree_ for estimator in clf.estimators_]
+    n_outputs = clf.n_outputs_
+    classes = clf.classes_ if n_outputs > 1 else [clf.classes_]
+    n_classes = np.array([len(c) for c in classes], dtype=np.int64)
+    max_classes = int(n_classes.max())
+
+    sizes = [tree.node_count for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    total = int(sum(sizes))
+
+    feature = np.zeros(total, dtype=np.int64)
+    threshold = np.zeros(total, dtype=np.float64)
+    left = np.zeros(total, dtype=np.int64)
+    right = np.zeros(total, dtype=np.int64)
+    missing_left = np.zeros(total, dtype=bool)
+    value = np.zeros((total, n_outputs, max_classes), dtype=np.float64)
+    max_depth = 0
+
+    for tree, offset, size in zip(trees, offsets, sizes):
+        nodes = np.arange(offset, offset + size)
+        is_leaf = tree.children_left == -1
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = tree.threshold
+        left[nodes] = np.where(is_leaf, nodes, tree.children_left + offset)
+        right[nodes] = np.where(is_leaf, nodes, tree.children_right + offset)
+        missing = getattr(tree, "missing_go_to_left", None)
+        if missing is not None:
+            missing_left[nodes] = missing.astype(bool)
+        # Per-tree class probabilities, normalised exactly like DecisionTreeClassifier.predict_proba
+        tree_value = tree.value
+        for k in range(n_outputs):
+            proba_k = tree_value[:, k, :n_classes[k]].copy()
+            normalizer = proba_k.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba_k /= normalizer
+            value[nodes, k, :n_classes[k]] = proba_k
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    padded_classes = np.zeros((n_outputs, max_classes), dtype=np.asarray(classes[0]).dtype)
+    for k, c in enumerate(classes):
+        padded_classes[k, :len(c)] = c
+
+    arrays = {
+        "feature": feature, "threshold": threshold, "left": left, "right": right,
+        "missing_left": missing_left, "value": value, "roots": offsets,
+        "classes": padded_classes, "n_classes": n_classes,
+    }
+    meta = {
+        "n_trees": len(trees),
+        "n_nodes": total,
+        "n_features": int(clf.n_features_in_),
+        "n_outputs": int(n_outputs),
+        "max_depth": max_depth,
+    }
+    return arrays, meta
+
+
+def export_forest(clf, path=FLAT_MODEL_DIR, extra_meta=None):
+    """Write a fitted RandomForestClassifier to path/*.npy + path/meta.json"""
+    arrays, meta = flatten_forest(clf)
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    meta.update(extra_meta or {})
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=4)
+    return meta
+
+
+def _model_key():
+    """Cache key of the current joblib model (see train_ml_classifier.model_cache_key)"""
+    try:
+        with open(MODEL_META_PATH, "r", encoding="utf-8") as f:
+            return {"key": json.load(f).get("key")}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def load_flat_meta(path=FLAT_MODEL_DIR):
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class FlatForest:
+    """Read-only forest evaluator over the arrays written by export_forest"""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.n_trees = meta["n_trees"]
+        self.n_outputs = meta["n_outputs"]
+        self.max_depth = meta["max_depth"]
+
+    @classmethod
+    def from_classifier(cls, clf):
+        return cls(*flatten_forest(clf))
+
+    @classmethod
+    def load(cls, path=FLAT_MODEL_DIR, mmap=True):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAY_NAMES}
+        return cls(arrays, meta)
+
+    @property
+    def classes_(self):
+        """Class labels per output, like RandomForestClassifier.classes_"""
+        classes = [self.classes[k, :self.n_classes[k]] for k in range(self.n_outputs)]
+        return classes if self.n_outputs > 1 else classes[0]
+
+    def __deepcopy__(self, memo):
+        # Immutable and usually memory-mapped: workers share the same arrays
+        return self
+
+    def _leaves(self, X):
+        """Leaf index reached in every tree, shape (n_trees, n_samples)"""
+        # scikit-learn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[np.newaxis, :]
+        node = np.repeat(np.asarray(self.roots)[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = (x <= self.threshold[node]) | (np.isnan(x) & self.missing_left[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X):
+        """List of (n_samples, n_classes_k) arrays, one per output (like scikit-learn)"""
+        leaves = self._leaves(X)
+        total = np.zeros((leaves.shape[1], self.n_outputs, self.value.shape[2]), dtype=np.float64)
+        # Accumulate tree by tree, in order, like RandomForestClassifier does
+        for tree_leaves in leaves:
+            total += self.value[tree_leaves]
+        total /= self.n_trees
+        proba = [total[:, k, :self.n_classes[k]] for k in range(self.n_outputs)]
+        return proba if self.n_outputs > 1 else proba[0]
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        if self.n_outputs == 1:
+            return self.classes[0, :self.n_classes[0]].take(np.argmax(proba, axis=1))
+        predictions = np.empty((len(proba[0]), self.n_outputs), dtype=self.classes.dtype)
+        for k in range(self.n_outputs):
+            predictions[:, k] = self.classes[k, :self.n_classes[k]].take(np.argmax(proba[k], axis=1))
+        return predictions
+
+
+def check(model_path=MODEL_PATH, csv_path="ml_training_data.csv", path=FLAT_MODEL_DIR):
+    """Export the joblib model, verify identical predictions and compare load times"""
+    import pandas as pd
+
+    start = time.perf_counter()
+    import joblib
+    clf = joblib.load(model_path)
+    joblib_load = time.perf_counter() - start
+
+    export_forest(clf, path, extra_meta=_model_key())
+    start = time.perf_counter()
+    flat = FlatForest.load(path)
+    flat_load = time.perf_counter() - start
+
+    from scripts.features import FEATURE_COLS
+    X = pd.read_csv(csv_path)[FEATURE_COLS]
+    identical = np.array_equal(clf.predict(X), flat.predict(X))
+    size = sum(os.path.getsize(os.path.join(path, f"{name}.npy")) for name in ARRAY_NAMES)
+    print(f"joblib load (incl. sklearn import): {joblib_load * 1000:.1f} ms, "
+          f"{os.path.getsize(model_path) / 1024:.0f} KiB")
+    print(f"flat load (mmap):                   {flat_load * 1000:.1f} ms, {size / 1024:.0f} KiB")
+    print(f"Identical predictions on {len(X)} rows: {identical}")
+    return identical
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export/check the flat NumPy form of the pros classifier")
+    parser.add_argument("--check", action="store_true",
+                        help="Export the joblib model and verify the flat evaluator matches it")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check() else 1)
+    import joblib
+    meta = export_forest(joblib.load(MODEL_PATH), extra_meta=_model_key())
+    print(f"Exported {meta['n_trees']} trees ({meta['n_nodes']} nodes) to {FLAT_MODEL_DIR}/")
@@ -0,0 +1,240 @@
+# scripts/instrumentation.py
+#
+# Run report for pipeline runs: wall and CPU time per stage and substage,
+# database statements (count, time, rows read/written) and peak RSS, written
+# as JSON at the end of the run. A stage entered several times (per batch,
+# per company) is one node with a call count and summed totals; per stage
+# the report gives how much it raised the process's peak RSS, and the peak
+# itself once for the whole run. Optionally each top-level stage is run
+# under cProfile and the profile of the slowest one is saved next to the
+# report.
+#
+#     report = start_run("pipeline", profile=True)
+#     with stage("analyze"):
+#         with stage("predict"):
+#             ...
+#     finish_run("data/reports/run.json")
+#
+# stage() is a no-op when no run is active. Stages are tracked on the thread
+# that started the run; statements executed by worker threads are counted
+# toward the stages open there, but stages opened inside workers are not
+# recorded separately. cProfile only sees the thread that started the run.
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from database.connection import set_query_listener
+
+# Statements listed in the report, slowest total time first
+TOP_STATEMENTS = 15
+# Lines of profile output printed for the slowest stage
+PROFILE_LINES = 25
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory, in MiB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Stage:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.queries = 0
+        self.query_s = 0.0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.calls = 0
+        # How much the process's peak RSS rose while this stage ran (ru_maxrss is a high-water mark)
+        self.peak_rss_growth_mb = None
+        self.status = "ok"
+        self.children = []
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "status": self.status,
+            "calls": self.calls,
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "queries": self.queries,
+            "query_s": round(self.query_s, 4),
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "peak_rss_growth_mb": self.peak_rss_growth_mb,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class RunReport:
+    def __init__(self, name="pipeline", profile=False):
+        self.root = Stage(name, name)
+        self.profile = profile
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.thread = threading.get_ident()
+        self.statements = {}    # normalized SQL -> [count, seconds, rows_written]
+        self.profiles = {}      # top-level stage path -> cProfile.Profile
+        self.peak_rss_mb = None
+        self._stack = [self.root]
+        self._lock = threading.Lock()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    # Query listener interface (see database/connection.py)
+    def record_query(self, operation, seconds, rows_written=0):
+        key = " ".join(str(operation).split())[:200]
+        with self._lock:
+            for open_stage in self._stack:
+                open_stage.queries += 1
+                open_stage.query_s += seconds
+                open_stage.rows_written += rows_written
+            entry = self.statements.setdefault(key, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += rows_written
+
+    def record_rows(self, rows_read):
+        with self._lock:
+            for open_stage in self._stack:
+                open_stage.rows_read += rows_read
+
+    def slowest_stage(self):
+        return max(self.root.children, key=lambda s: s.wall_s, default=None)
+
+    def to_dict(self):
+        slowest = self.slowest_stage()
+        statements = sorted(self.statements.items(), key=lambda item: -item[1][1])[:TOP_STATEMENTS]
+        return {
+            "started_at": self.started_at,
+            "argv": sys.argv,
+            "python": sys.version.split()[0],
+            "profiled": self.profile,
+            "slowest_stage": slowest.path if slowest else None,
+            "peak_rss_mb": self.peak_rss_mb,
+            "run": self.root.to_dict(),
+            "top_statements": [
+                {"sql": sql, "count": count, "total_s": round(seconds, 4), "rows_written": written}
+                for sql, (count, seconds, written) in statements
+            ],
+        }
+
+
+_current = None
+
+
+def start_run(name="pipeline", profile=False):
+    """Begin recording a run; database.connection cursors start reporting to it"""
+    global _current
+    _current = RunReport(name, profile)
+    set_query_listener(_current)
+    return _current
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current run (nested calls become substages).
+
+    Entering a stage name again under the same parent (once per batch, per
+    company, ...) adds to the same node and counts the call.
+    """
+    report = _current
+    if report is None or threading.get_ident() != report.thread:
+        yield None
+        return
+    with report._lock:
+        parent = report._stack[-1]
+        node = next((child for child in parent.children if child.name == name), None)
+        if node is None:
+            node = Stage(name, f"{parent.path}/{name}")
+            parent.children.append(node)
+        node.calls += 1
+        report._stack.append(node)
+    profiler = None
+    if report.profile and parent is report.root:
+        profiler = report.profiles.get(node.path) or cProfile.Profile()
+        profiler.enable()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    rss_start = peak_rss_mb()
+    try:
+        yield node
+    except BaseException:
+        node.status = "failed"
+        raise
+    finally:
+        node.wall_s += time.perf_counter() - wall_start
+        node.cpu_s += time.process_time() - cpu_start
+        if profiler is not None:
+            profiler.disable()
+            report.profiles[node.path] = profiler
+        rss_end = peak_rss_mb()
+        if rss_end is not None:
+            node.peak_rss_growth_mb = round((node.peak_rss_growth_mb or 0) + rss_end - rss_start, 1)
+        with report._lock:
+            report._stack.remove(node)
+
+
+def print_summary(report):
+    print(f"\n{'stage':<40}{'calls':>7}{'wall s':>9}{'cpu s':>9}{'queries':>9}{'query s':>9}{'read':>9}{'written':>9}")
+
+    def walk(node, depth):
+        label = "  " * depth + node.name
+        print(f"{label:<40}{node.calls:>7}{node.wall_s:>9.2f}{node.cpu_s:>9.2f}{node.queries:>9}{node.query_s:>9.2f}"
+              f"{node.rows_read:>9}{node.rows_written:>9}")
+        for child in node.children:
+            walk(child, depth + 1)
+
+    walk(report.root, 0)
+    print(f"Peak RSS: {report.peak_rss_mb} MiB")
+
+
+def finish_run(path, status="ok"):
+    """Stop recording, write the JSON report to path and return its dict"""
+    global _current
+    report = _current
+    if report is None:
+        return None
+    _current = None
+    set_query_listener(None)
+
+    report.root.wall_s = time.perf_counter() - report._wall_start
+    report.root.cpu_s = time.process_time() - report._cpu_start
+    report.root.calls = 1
+    report.peak_rss_mb = peak_rss_mb()
+    report.root.status = status
+    data = report.to_dict()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    slowest = report.slowest_stage()
+    if slowest is not None and slowest.path in report.profiles:
+        profile_path = f"{os.path.splitext(path)[0]}.{slowest.name}.prof"
+        profiler = report.profiles[slowest.path]
+        profiler.dump_stats(profile_path)
+        data["profile"] = {"stage": slowest.path, "path": profile_path}
+        print(f"\nProfile of the slowest stage ({slowest.path}) saved to {profile_path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_LINES)
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print_summary(report)
+    print(f"Run report written to {path}")
+    return data
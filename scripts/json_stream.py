@@ -0,0 +1,179 @@
+# scripts/json_stream.py
+#
+# Incremental reader for raw company JSON files. Instead of json.load on the
+# whole file it walks the outer structure itself and decodes one company row
+# or one statement row at a time with JSONDecoder.raw_decode, so memory is
+# bounded by the read buffer and the largest single row, not the file size.
+#
+# Accepted layouts:
+#     {"company": {...}, "data": {"cashflow": [...], ...}}     one company per file
+#     [{"company": ..., "data": ...}, ...]                      bulk export
+#     {"companies": [{"company": ..., "data": ...}, ...]}       bulk export
+
+import re
+import json
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What may follow a decoded number prefix when the rest of the number is still unread ("12." of "12.5")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+CHUNK_SIZE = 1 << 16
+
+
+class JSONStreamError(ValueError):
+    """Malformed or truncated JSON"""
+
+
+class MissingKeyError(JSONStreamError):
+    """A company object without its "company" or "data" key"""
+
+
+class JSONStreamReader:
+    """Pull-style tokenizer over a text file object"""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Read more input, dropping what was consumed; False at end of file"""
+        if self._eof:
+            return False
+        # Read at least as much as is buffered so re-decoding a long value stays linear
+        chunk = self._fp.read(max(self._chunk_size, len(self._buf) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ('' at end of file)"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        """Consume one of the structural characters in chars and return it"""
+        ch = self.peek()
+        if not ch or ch not in chars:
+            found = repr(ch) if ch else "end of file"
+            raise JSONStreamError(f"Expected one of {chars!r}, found {found}")
+        self._pos += 1
+        return ch
+
+    def value(self):
+        """Decode the complete JSON value at the cursor"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number ending at the buffer edge, or cut after its "." or "e", may continue in the next chunk
+                if self._eof or not _NUMBER_TAIL.fullmatch(self._buf, end):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise JSONStreamError(str(e)) from e
+            self._fill()
+
+    def skip(self):
+        self.value()
+
+
+def iter_object(reader):
+    """Yield the keys of the object at the cursor; the caller consumes each value"""
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.expect("}")
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise JSONStreamError(f"Object key must be a string, got {key!r}")
+        reader.expect(":")
+        yield key
+        if reader.expect(",}") == "}":
+            return
+
+
+def iter_array(reader):
+    """Yield once per element of the array at the cursor; the caller consumes each element"""
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+    while True:
+        yield
+        if reader.expect(",]") == "]":
+            return
+
+
+def _company_records(reader):
+    seen_company = seen_data = is_wrapper = False
+    early_data = None
+    for key in iter_object(reader):
+        if key == "company":
+            seen_company = True
+            yield "companies", reader.value()
+        elif key == "data":
+            seen_data = True
+            if not seen_company:
+                # Statement rows must follow their company row; keep this company's data until then
+                early_data = reader.value()
+                continue
+            yield from _statement_records(reader)
+        elif key == "companies" and reader.peek() == "[":
+            is_wrapper = True
+            for _ in iter_array(reader):
+                yield from _company_records(reader)
+        else:
+            reader.skip()
+    if is_wrapper:
+        return
+    if not seen_company:
+        raise MissingKeyError("'company' key not found.")
+    if not seen_data:
+        raise MissingKeyError("'data' key not found.")
+    if isinstance(early_data, dict):
+        for table, rows in early_data.items():
+            if isinstance(rows, list):
+                for row in rows:
+                    yield table, row
+
+
+def _statement_records(reader):
+    if reader.peek() != "{":
+        reader.skip()
+        return
+    for table in iter_object(reader):
+        if reader.peek() != "[":
+            reader.skip()
+            continue
+        for _ in iter_array(reader):
+            yield table, reader.value()
+
+
+def iter_records(fp, chunk_size=CHUNK_SIZE):
+    """Yield ("companies", company) and (table, row) pairs in file order.
+
+    Each company row is yielded before its statement rows. Raises
+    JSONStreamError on malformed input and MissingKeyError for a company
+    object without "company" or "data".
+    """
+    reader = JSONStreamReader(fp, chunk_size)
+    if reader.peek() == "[":
+        for _ in iter_array(reader):
+            yield from _company_records(reader)
+    else:
+        yield from _company_records(reader)
+    if reader.peek():
+        raise JSONStreamError("Extra data after the top-level value")
@@ -1,132 +1,277 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-import json
-import mysql.connector
+import math
+import time
+import decimal
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from mysql.connector import Error
-from config.config import DB_CONFIG
+from config.config import DB_CONFIG, STORE_BATCH_SIZE
+from database.connection import connect
+from database.pool import ConnectionPool, PoolTimeout
+from database.version import bump_data_version
+from scripts.json_stream import iter_records, JSONStreamError, MissingKeyError
+from scripts.store_results import refresh_company_summary
+
+COMPANY_FIELDS = ["id", "company_logo", "company_name", "chart_link", "about_company", "website",
+                  "nse_profile", "bse_profile", "face_value", "book_value", "roce_percentage",
+                  "roe_percentage"]
+
+# Statement tables in insert order, with the JSON fields copied into each
+TABLE_FIELDS = {
+    "cashflow": ["id", "company_id", "year", "operating_activity", "investing_activity",
+                 "financing_activity", "net_cash_flow"],
+    "balancesheet": ["id", "company_id", "year", "equity_capital", "reserves", "borrowings",
+                     "other_liabilities", "total_liabilities", "fixed_assets", "cwip",
+                     "investments", "other_asset", "total_assets"],
+    "profitandloss": ["id", "company_id", "year", "sales", "expenses", "operating_profit",
+                      "opm_percentage", "other_income", "interest", "depreciation",
+                      "profit_before_tax", "tax_percentage", "net_profit", "eps",
+                      "dividend_payout"],
+    "prosandcons": ["id", "company_id", "pros", "cons"],
+    "analysis": ["id", "company_id", "compounded_sales_growth",
+                 "compounded_profit_growth", "stock_price_cagr", "roe"],
+}
+
+# DECIMAL columns the raw files carry as text ("16%", "0.00", ""); converted with parse_decimal
+NUMERIC_TEXT_FIELDS = {
+    "profitandloss": ["tax_percentage", "dividend_payout"],
+    "analysis": ["compounded_sales_growth", "compounded_profit_growth", "stock_price_cagr", "roe"],
+}
+
+
+def parse_decimal(value):
+    """Number from a raw value such as 12.5, "12.34%", "1,234.5" or ""; None if it isn't one"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return decimal.Decimal(str(value)) if math.isfinite(value) else None
+    text = str(value).strip().rstrip("%").replace(",", "").strip()
+    if not text:
+        return None
+    try:
+        number = decimal.Decimal(text)
+    except decimal.InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+class MigrationStats:
+    """Rows written and seconds spent in INSERTs per table, and the imported company ids, shared by the workers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = {}
+        self.seconds = {}
+        self.company_ids = set()
+
+    def add(self, table, rows, seconds):
+        with self._lock:
+            self.rows[table] = self.rows.get(table, 0) + rows
+            self.seconds[table] = self.seconds.get(table, 0.0) + seconds
+
+    def add_companies(self, company_ids):
+        with self._lock:
+            self.company_ids.update(company_ids)
+
+    def report(self, elapsed):
+        print(f"{'table':<15}{'rows':>10}{'insert s':>10}{'rows/s':>12}")
+        for table in ["companies"] + list(TABLE_FIELDS):
+            rows = self.rows.get(table, 0)
+            seconds = self.seconds.get(table, 0.0)
+            rate = rows / seconds if seconds > 0 else 0.0
+            print(f"{table:<15}{rows:>10}{seconds:>10.2f}{rate:>12.0f}")
+        total = sum(self.rows.values())
+        rate = total / elapsed if elapsed > 0 else 0.0
+        print(f"{'total':<15}{total:>10}{elapsed:>10.2f}{rate:>12.0f}  (wall clock)")
 
 
 def get_connection():
     # You can tweak connection_timeout if needed
-    return mysql.connector.connect(**DB_CONFIG)
+    return connect()
 
 
 def insert_company(cursor, company):
-    sql = """
-        INSERT INTO companies
-        (id, company_logo, company_name, chart_link, about_company, website, nse_profile, bse_profile,
-         face_value, book_value, roce_percentage, roe_percentage)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-        company_logo=VALUES(company_logo), company_name=VALUES(company_name),
-        chart_link=VALUES(chart_link), about_company=VALUES(about_company), website=VALUES(website),
-        nse_profile=VALUES(nse_profile), bse_profile=VALUES(bse_profile),
-        face_value=VALUES(face_value), book_value=VALUES(book_value),
-        roce_percentage=VALUES(roce_percentage), roe_percentage=VALUES(roe_percentage)
-    """
-    vals = (
-        company.get("id"),
-        company.get("company_logo"),
-        company.get("company_name"),
-        company.get("chart_link"),
-        company.get("about_company"),
-        company.get("website"),
-        company.get("nse_profile"),
-        company.get("bse_profile"),
-        company.get("face_value"),
-        company.get("book_value"),
-        company.get("roce_percentage"),
-        company.get("roe_percentage"),
-    )
-    cursor.execute(sql, vals)
-
-
-def insert_many(table, cursor, items, fields):
+    insert_companies(cursor, [company])
+
+
+def insert_companies(cursor, companies, batch_size=STORE_BATCH_SIZE):
+    """Multi-row upsert into companies; returns rows sent"""
+    field_str = ', '.join(COMPANY_FIELDS)
+    row_placeholder = "(" + ', '.join(['%s'] * len(COMPANY_FIELDS)) + ")"
+    updates = ', '.join(f"{f}=VALUES({f})" for f in COMPANY_FIELDS if f != "id")
+    for start in range(0, len(companies), batch_size):
+        batch = companies[start:start + batch_size]
+        sql = (f"INSERT INTO companies ({field_str}) VALUES " + ', '.join([row_placeholder] * len(batch))
+               + f" ON DUPLICATE KEY UPDATE {updates}")
+        cursor.execute(sql, [company.get(f) for company in batch for f in COMPANY_FIELDS])
+    return len(companies)
+
+
+def insert_many(table, cursor, items, fields, batch_size=STORE_BATCH_SIZE):
+    """Multi-row INSERT IGNORE, batch_size rows per statement; returns rows sent"""
     if not items:
-        return
+        return 0
     field_str = ', '.join(fields)
-    value_str = ', '.join(['%s'] * len(fields))
-    sql = f"INSERT IGNORE INTO {table} ({field_str}) VALUES ({value_str})"
-    for item in items:
-        vals = tuple(item.get(f) for f in fields)
-        cursor.execute(sql, vals)
+    row_placeholder = "(" + ', '.join(['%s'] * len(fields)) + ")"
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        sql = f"INSERT IGNORE INTO {table} ({field_str}) VALUES " + ', '.join([row_placeholder] * len(batch))
+        cursor.execute(sql, [item.get(f) for item in batch for f in fields])
+    return len(items)
 
 
-def process_file(raw_dir, fname):
-    path = os.path.join(raw_dir, fname)
-    print(f"\n📄 Processing {fname} ...")
+class BatchWriter:
+    """Buffers streamed rows per table and writes them batch_size at a time"""
+
+    def __init__(self, cursor, stats=None, batch_size=STORE_BATCH_SIZE):
+        self.cursor = cursor
+        self.stats = stats
+        self.batch_size = batch_size
+        self.pending = {table: [] for table in ["companies"] + list(TABLE_FIELDS)}
+        self.companies = 0
+        self.company_ids = []
+        self.rows = 0
+
+    def add(self, table, row):
+        rows = self.pending.get(table)
+        if rows is None:
+            return  # not a table we import
+        for field in NUMERIC_TEXT_FIELDS.get(table, ()):
+            if field in row:
+                row[field] = parse_decimal(row[field])
+        rows.append(row)
+        self.rows += 1
+        if table == "companies":
+            self.companies += 1
+            self.company_ids.append(row.get("id"))
+        if len(rows) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        """Write buffered rows (of one table, or all); companies always go first for the FKs"""
+        tables = list(self.pending) if table is None else ["companies", table]
+        for name in dict.fromkeys(tables):
+            rows = self.pending[name]
+            if not rows:
+                continue
+            self.pending[name] = []
+            start = time.perf_counter()
+            if name == "companies":
+                insert_companies(self.cursor, rows, self.batch_size)
+            else:
+                insert_many(name, self.cursor, rows, TABLE_FIELDS[name], self.batch_size)
+            if self.stats is not None:
+                self.stats.add(name, len(rows), time.perf_counter() - start)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
-    # Load JSON
+def load_checkpoints():
+    """{file_name: (sha256, status)} from the migration_checkpoints ledger"""
+    db = get_connection()
     try:
-        with open(path, encoding='utf-8') as fin:
-            data = json.load(fin)
-    except Exception as e:
-        print(f"Could not open or parse {fname}: {e}")
-        return
+        cursor = db.cursor()
+        cursor.execute("SELECT file_name, sha256, status FROM migration_checkpoints")
+        checkpoints = {file_name: (sha256, status) for file_name, sha256, status in cursor.fetchall()}
+        cursor.close()
+        return checkpoints
+    finally:
+        db.close()
 
-    if "company" not in data:
-        print(f"Skipping {fname}: 'company' key not found.")
-        return
-    if "data" not in data:
-        print(f"Skipping {fname}: 'data' key not found.")
+
+def record_checkpoint(cursor, fname, sha256, status, companies=0, row_count=0, error=None):
+    cursor.execute("""
+        INSERT INTO migration_checkpoints (file_name, sha256, status, companies, row_count, error)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+        sha256=VALUES(sha256), status=VALUES(status), companies=VALUES(companies),
+        row_count=VALUES(row_count), error=VALUES(error)
+    """, (fname, sha256, status, companies, row_count, error))
+
+
+def record_failure(db, fname, sha256, error):
+    """Mark a file failed after its transaction was rolled back, so the next run retries it"""
+    if db is None or sha256 is None:
         return
+    try:
+        db.rollback()
+        cursor = db.cursor()
+        record_checkpoint(cursor, fname, sha256, "failed", error=str(error)[:1000])
+        db.commit()
+        cursor.close()
+    except Exception:
+        pass  # no ledger row either way means the file is retried
+
 
-    company = data["company"]
-    dat = data.get("data", {})
+def process_file(raw_dir, fname, pool=None, stats=None, batch_size=STORE_BATCH_SIZE,
+                 checkpoints=None, force=False):
+    """Import one company file in a single transaction.
+
+    Returns True when imported, None when skipped because the ledger
+    (checkpoints, see load_checkpoints) says this exact content was already
+    imported, and False on failure. The ledger row is written in the same
+    transaction as the data, so a file is never marked done without its rows.
+
+    With a pool the connection is borrowed from it (and given back by
+    close()), otherwise a new connection is opened for the file.
+    """
+    path = os.path.join(raw_dir, fname)
+    try:
+        sha256 = file_sha256(path)
+    except OSError as e:
+        print(f"Could not open or parse {fname}: {e}")
+        return False
+    if not force and checkpoints is not None and checkpoints.get(fname) == (sha256, "done"):
+        print(f"⏭️  Skipping {fname}: unchanged since it was imported.")
+        return None
+    print(f"\n📄 Processing {fname} ...")
 
-    # New connection per file
+    db = cursor = None
     try:
-        db = get_connection()
+        db = pool.acquire() if pool is not None else get_connection()
         cursor = db.cursor()
 
         db.start_transaction()
-        insert_company(cursor, company)
-
-        # Cashflow
-        insert_many(
-            "cashflow", cursor, dat.get("cashflow", []),
-            ["id", "company_id", "year", "operating_activity", "investing_activity",
-             "financing_activity", "net_cash_flow"]
-        )
-        # Balancesheet
-        insert_many(
-            "balancesheet", cursor, dat.get("balancesheet", []),
-            ["id", "company_id", "year", "equity_capital", "reserves", "borrowings",
-             "other_liabilities", "total_liabilities", "fixed_assets", "cwip",
-             "investments", "other_asset", "total_assets"]
-        )
-        # Profit and Loss
-        insert_many(
-            "profitandloss", cursor, dat.get("profitandloss", []),
-            ["id", "company_id", "year", "sales", "expenses", "operating_profit",
-             "opm_percentage", "other_income", "interest", "depreciation",
-             "profit_before_tax", "tax_percentage", "net_profit", "eps",
-             "dividend_payout"]
-        )
-        # Pros and Cons
-        insert_many(
-            "prosandcons", cursor, dat.get("prosandcons", []),
-            ["id", "company_id", "pros", "cons"]
-        )
-        # Analysis
-        insert_many(
-            "analysis", cursor, dat.get("analysis", []),
-            ["id", "company_id", "compounded_sales_growth",
-             "compounded_profit_growth", "stock_price_cagr", "roe"]
-        )
+        # Rows are parsed incrementally and written in batches, so memory
+        # stays bounded however large the file is (see scripts/json_stream.py)
+        writer = BatchWriter(cursor, stats, batch_size)
+        with open(path, encoding='utf-8') as fin:
+            for table, row in iter_records(fin):
+                writer.add(table, row)
+        writer.flush()
 
+        record_checkpoint(cursor, fname, sha256, "done", writer.companies, writer.rows)
         db.commit()
-        print(f"Imported {fname} successfully.")
+        if stats is not None:
+            stats.add_companies(writer.company_ids)
+        if writer.companies > 1:
+            print(f"Imported {fname} successfully ({writer.companies} companies).")
+        else:
+            print(f"Imported {fname} successfully.")
+        return True
 
-    except Error as e:
+    except (OSError, JSONStreamError) as e:
+        if isinstance(e, MissingKeyError):
+            print(f"Skipping {fname}: {e}")
+        else:
+            print(f"Could not open or parse {fname}: {e}")
+        record_failure(db, fname, sha256, e)
+        return False
+    except (Error, PoolTimeout) as e:
         # If connection is lost mid-file, that file may be partial; rerun will fix thanks to
         # ON DUPLICATE KEY UPDATE + INSERT IGNORE
         print(f"Error importing {fname}: {type(e).__name__}: {e}")
-        try:
-            db.rollback()
-        except Exception:
-            pass
+        record_failure(db, fname, sha256, f"{type(e).__name__}: {e}")
+        return False
     finally:
         try:
             cursor.close()
@@ -135,17 +280,82 @@ def process_file(raw_dir, fname):
             pass
 
 
-def main():
-    raw_dir = os.path.join(os.path.dirname(__file__), "..", "data", "raw")
+def mark_data_changed(company_ids=(), batch_size=STORE_BATCH_SIZE):
+    """Rebuild the company_summary rows of the imported companies and bump data_version once per run.
+
+    The listing and search pages read company_summary only, so imported or
+    renamed companies show up there without waiting for a store run; the
+    version bump makes the web app drop its caches.
+    """
+    db = get_connection()
+    try:
+        cursor = db.cursor()
+        company_ids = sorted(company_id for company_id in company_ids if company_id is not None)
+        for start in range(0, len(company_ids), batch_size):
+            refresh_company_summary(cursor, company_ids[start:start + batch_size])
+        bump_data_version(cursor)
+        db.commit()
+        cursor.close()
+    finally:
+        db.close()
+
+
+def main(workers=1, batch_size=STORE_BATCH_SIZE, force=False, raw_dir=None):
+    """Import every data/raw/*.json file.
+
+    Files whose content hash is recorded as done in migration_checkpoints
+    are skipped, so a restarted run only retries failed, new or changed
+    files; force=True re-imports everything.
+
+    With workers > 1 files are parsed and imported by a thread pool that
+    shares workers pooled connections (each file is still its own
+    transaction). Prints rows/sec per table at the end.
+    """
+    raw_dir = raw_dir or os.path.join(os.path.dirname(__file__), "..", "data", "raw")
     files = [f for f in os.listdir(raw_dir) if f.endswith('.json')]
     files.sort()  # deterministic order
     print(f"Found {len(files)} JSON files.")
 
-    for fname in files:
-        process_file(raw_dir, fname)
+    try:
+        checkpoints = load_checkpoints()
+    except Error as e:
+        print(f"Could not read migration_checkpoints ({e}); create it from database_schema.sql")
+        return
+
+    stats = MigrationStats()
+    started = time.perf_counter()
+    options = dict(stats=stats, batch_size=batch_size, checkpoints=checkpoints, force=force)
+    if workers > 1:
+        pool = ConnectionPool(DB_CONFIG, pool_size=workers)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(
+                    lambda fname: process_file(raw_dir, fname, pool=pool, **options), files))
+        finally:
+            pool.close_all()
+    else:
+        outcomes = [process_file(raw_dir, fname, **options) for fname in files]
+
+    imported = outcomes.count(True)
+    if imported:
+        mark_data_changed(stats.company_ids, batch_size)
+    elapsed = time.perf_counter() - started
 
-    print("\n🏁 Migration complete.")
+    print(f"\n🏁 Migration complete: {imported} imported, {outcomes.count(None)} unchanged (skipped), "
+          f"{outcomes.count(False)} failed, of {len(files)} files.")
+    stats.report(elapsed)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import data/raw/*.json into MySQL")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Import files across N threads sharing N pooled connections")
+    parser.add_argument("--batch-size", type=int, default=STORE_BATCH_SIZE,
+                        help="Rows per multi-row INSERT statement")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-import files even if the checkpoint ledger says they are unchanged")
+    parser.add_argument("--raw-dir", default=None, help="Directory of JSON files (default: data/raw)")
+    args = parser.parse_args()
+    main(workers=args.workers, batch_size=args.batch_size, force=args.force, raw_dir=args.raw_dir)
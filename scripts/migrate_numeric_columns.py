@@ -0,0 +1,266 @@
+# scripts/migrate_numeric_columns.py
+#
+# One-off schema migration for databases created while the percentage
+# columns were VARCHAR ("12.34%", "0.00", ""):
+#
+#     profitandloss    tax_percentage, dividend_payout
+#     analysis         compounded_sales_growth, compounded_profit_growth, stock_price_cagr, roe
+#     company_summary  compounded_sales_growth, compounded_profit_growth
+#
+# For each column a DECIMAL shadow column is added and filled batch by batch
+# (keyset over the primary key, text parsed with parse_decimal, one commit
+# per batch), then the text column is dropped and the shadow renamed in its
+# place. Every step checks the current column types first, so an interrupted
+# run is finished by running it again. Indexes that include a converted
+# column (read from the database, e.g. idx_profitandloss_features) are
+# dropped before the swap and re-created on the numeric column; afterwards
+# any index of database_schema.sql on these columns that is still missing
+# is created.
+#
+# Needs MySQL 8.0+ (RENAME COLUMN) or SQLite 3.35+ (DROP COLUMN). Don't run
+# the pipeline or the migration script at the same time.
+
+import os
+import re
+import sys
+import time
+from mysql.connector import Error
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.config import DB_BACKEND
+from database.connection import connect
+from database.sqlite_backend import schema_statements
+from database.version import bump_data_version
+from scripts.migrate_json_to_mysql import parse_decimal
+
+BATCH_SIZE = 5000
+
+# table -> (primary key, {column: DECIMAL type}); types as in database_schema.sql
+NUMERIC_COLUMNS = {
+    "profitandloss": ("id", {
+        "tax_percentage": "DECIMAL(10,4)",
+        "dividend_payout": "DECIMAL(10,4)",
+    }),
+    "analysis": ("id", {
+        "compounded_sales_growth": "DECIMAL(14,2)",
+        "compounded_profit_growth": "DECIMAL(14,2)",
+        "stock_price_cagr": "DECIMAL(14,2)",
+        "roe": "DECIMAL(10,2)",
+    }),
+    "company_summary": ("company_id", {
+        "compounded_sales_growth": "DECIMAL(14,2)",
+        "compounded_profit_growth": "DECIMAL(14,2)",
+    }),
+}
+
+NUMERIC_TYPES = ("decimal", "numeric", "int", "float", "double", "real")
+
+
+def shadow_name(column):
+    return f"{column}_num"
+
+
+def column_types(cursor, table):
+    """{column: lower-case declared type} of a table"""
+    if DB_BACKEND == "sqlite":
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1]: row[2].lower() for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {name: data_type.lower() for name, data_type in cursor.fetchall()}
+
+
+def index_names(cursor, table):
+    if DB_BACKEND == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table})")
+        return {row[1] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def index_columns(cursor, table):
+    """{index: (unique, [column, ...] in index order)} of the table's droppable secondary indexes"""
+    indexes = {}
+    if DB_BACKEND == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table})")
+        # origin "c": CREATE INDEX; primary key and UNIQUE constraint indexes can't be dropped
+        for _, name, unique, origin, *_ in cursor.fetchall():
+            if origin == "c":
+                indexes[name] = (bool(unique), [])
+        for name, (_, columns) in indexes.items():
+            cursor.execute(f"PRAGMA index_info({name})")
+            columns.extend(column for _, _, column in sorted(cursor.fetchall()))
+        return indexes
+    cursor.execute("""
+        SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    for name, non_unique, column, sub_part in cursor.fetchall():
+        unique, columns = indexes.setdefault(name, (not non_unique, []))
+        columns.append(f"{column}({sub_part})" if sub_part else column)
+    return indexes
+
+
+def _bare_column(column):
+    """Column name without a MySQL prefix length, e.g. company_name(20) -> company_name"""
+    return column.split("(", 1)[0]
+
+
+def create_index(cursor, table, index, unique, columns):
+    cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index} ON {table} ({', '.join(columns)})")
+    print(f"Created index {index} on {table}({', '.join(columns)})")
+
+
+_SCHEMA_INDEX = re.compile(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)\s*\((.*)\)$",
+                           re.IGNORECASE | re.DOTALL)
+
+
+def schema_indexes():
+    """[(table, index, unique, columns)] of database_schema.sql that include a converted column"""
+    indexes = []
+    for statement in schema_statements():
+        match = _SCHEMA_INDEX.match(statement)
+        if not match:
+            continue
+        unique, index, table, columns = match.groups()
+        columns = [column.strip() for column in columns.split(",")]
+        if table in NUMERIC_COLUMNS and set(map(_bare_column, columns)) & set(NUMERIC_COLUMNS[table][1]):
+            indexes.append((table, index, bool(unique), columns))
+    return indexes
+
+
+def drop_index(cursor, table, index):
+    if DB_BACKEND == "sqlite":
+        cursor.execute(f"DROP INDEX {index}")
+    else:
+        cursor.execute(f"DROP INDEX {index} ON {table}")
+
+
+def is_numeric(column_type):
+    return column_type.startswith(NUMERIC_TYPES)
+
+
+def backfill(conn, table, key, columns, batch_size=BATCH_SIZE):
+    """Fill the shadow columns from the text columns, batch_size rows per transaction.
+
+    Returns (rows, unparsable): rows read, and values that were not empty
+    but not a number either (stored as NULL).
+    """
+    cursor = conn.cursor()
+    shadows = [shadow_name(column) for column in columns]
+    select = f"SELECT {key}, {', '.join(columns)} FROM {table}"
+    update = (f"UPDATE {table} SET " + ", ".join(f"{shadow} = %s" for shadow in shadows)
+              + f" WHERE {key} = %s")
+    rows = unparsable = 0
+    last_key = None
+    while True:
+        if last_key is None:
+            cursor.execute(f"{select} ORDER BY {key} LIMIT %s", (batch_size,))
+        else:
+            cursor.execute(f"{select} WHERE {key} > %s ORDER BY {key} LIMIT %s", (last_key, batch_size))
+        batch = cursor.fetchall()
+        if not batch:
+            break
+        updates = []
+        for row in batch:
+            values = [parse_decimal(value) for value in row[1:]]
+            unparsable += sum(1 for raw, value in zip(row[1:], values)
+                              if value is None and raw is not None and str(raw).strip())
+            updates.append((*values, row[0]))
+        cursor.executemany(update, updates)
+        conn.commit()
+        rows += len(batch)
+        last_key = batch[-1][0]
+        print(f"  {table}: {rows} rows converted")
+    cursor.close()
+    return rows, unparsable
+
+
+def migrate_table(conn, table, key, columns, batch_size=BATCH_SIZE):
+    """Convert the text columns of one table; returns the columns converted"""
+    cursor = conn.cursor()
+    types = column_types(cursor, table)
+    pending = []
+    for column, decimal_type in columns.items():
+        shadow = shadow_name(column)
+        if column not in types and shadow in types:
+            # Interrupted between DROP and RENAME
+            cursor.execute(f"ALTER TABLE {table} RENAME COLUMN {shadow} TO {column}")
+            continue
+        if is_numeric(types.get(column, "")) and shadow not in types:
+            continue
+        if shadow not in types:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {shadow} {decimal_type}")
+        pending.append(column)
+    conn.commit()
+    if not pending:
+        cursor.close()
+        print(f"{table}: already numeric")
+        return []
+
+    print(f"{table}: converting {', '.join(pending)}")
+    start = time.perf_counter()
+    rows, unparsable = backfill(conn, table, key, pending, batch_size)
+    # An index including a text column blocks DROP COLUMN on SQLite, and MySQL would silently drop
+    # the column from it: drop every such index and re-create it on the numeric column
+    affected = {index: spec for index, spec in index_columns(cursor, table).items()
+                if set(map(_bare_column, spec[1])) & set(pending)}
+    for index in affected:
+        drop_index(cursor, table, index)
+    for column in pending:
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+        cursor.execute(f"ALTER TABLE {table} RENAME COLUMN {shadow_name(column)} TO {column}")
+    for index, (unique, index_cols) in affected.items():
+        create_index(cursor, table, index, unique, index_cols)
+    conn.commit()
+    cursor.close()
+    print(f"{table}: {rows} rows in {time.perf_counter() - start:.1f}s"
+          + (f", {unparsable} non-numeric values stored as NULL" if unparsable else ""))
+    return pending
+
+
+def create_indexes(conn):
+    """Create the schema's indexes on the converted columns that are missing (older databases, interrupted runs)"""
+    cursor = conn.cursor()
+    for table, index, unique, columns in schema_indexes():
+        if index not in index_names(cursor, table):
+            create_index(cursor, table, index, unique, columns)
+    conn.commit()
+    cursor.close()
+
+
+def main(batch_size=BATCH_SIZE):
+    conn = connect()
+    try:
+        converted = {}
+        for table, (key, columns) in NUMERIC_COLUMNS.items():
+            converted[table] = migrate_table(conn, table, key, columns, batch_size)
+        create_indexes(conn)
+        if any(converted.values()):
+            cursor = conn.cursor()
+            bump_data_version(cursor)
+            conn.commit()
+            cursor.close()
+            if converted["profitandloss"]:
+                print("dividend_payout changed type: the next pipeline run re-analyzes every company.")
+    except Error as e:
+        print(f"Migration stopped: {e}\nRun the script again to resume.")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert VARCHAR percentage columns to DECIMAL")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Rows converted per transaction")
+    args = parser.parse_args()
+    main(batch_size=args.batch_size)
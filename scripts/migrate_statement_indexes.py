@@ -0,0 +1,116 @@
+# scripts/migrate_statement_indexes.py
+#
+# One-off index migration for databases created while cashflow, balancesheet
+# and profitandloss had separate company_id and year indexes. Brings them to
+# the current schema:
+#
+#     UNIQUE (company_id, year)                         all three tables
+#     (company_id, year, <columns the features read>)   balancesheet, profitandloss
+#
+# Duplicate (company_id, year) rows would make the unique index fail, so
+# they are removed first, keeping the row with the lowest id (the one the
+# migration imported first); --dry-run only reports them. The old
+# single-column indexes are dropped after the new ones exist, because MySQL
+# needs an index starting with company_id for the foreign key at all times.
+# Safe to run again.
+
+import os
+import sys
+from mysql.connector import Error
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database.connection import connect
+from scripts.migrate_numeric_columns import index_names, drop_index
+
+DELETE_BATCH_SIZE = 1000
+
+# table -> [(index, unique, columns)]; as in database_schema.sql
+STATEMENT_INDEXES = {
+    "cashflow": [
+        ("uq_cashflow_company_year", True, "company_id, year"),
+    ],
+    "balancesheet": [
+        ("uq_balancesheet_company_year", True, "company_id, year"),
+        ("idx_balancesheet_features", False, "company_id, year, borrowings, total_liabilities"),
+    ],
+    "profitandloss": [
+        ("uq_profitandloss_company_year", True, "company_id, year"),
+        ("idx_profitandloss_features", False, "company_id, year, sales, net_profit, dividend_payout"),
+    ],
+}
+
+LEGACY_INDEXES = {
+    table: [f"idx_{table}_company", f"idx_{table}_year"] for table in STATEMENT_INDEXES
+}
+
+
+def find_duplicates(cursor, table):
+    """Ids of rows repeating an earlier row's (company_id, year), lowest id kept"""
+    cursor.execute(f"""
+        SELECT t.id FROM {table} t
+        JOIN (
+            SELECT company_id, year, MIN(id) AS keep_id FROM {table}
+            GROUP BY company_id, year HAVING COUNT(*) > 1
+        ) d ON d.company_id = t.company_id AND d.year = t.year
+        WHERE t.id <> d.keep_id
+        ORDER BY t.id
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def delete_rows(conn, table, ids, batch_size=DELETE_BATCH_SIZE):
+    cursor = conn.cursor()
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+        conn.commit()
+    cursor.close()
+
+
+def migrate_table(conn, table, dry_run=False):
+    cursor = conn.cursor()
+    duplicates = find_duplicates(cursor, table)
+    if duplicates:
+        print(f"{table}: {len(duplicates)} duplicate (company_id, year) rows"
+              + (f", e.g. ids {duplicates[:5]}" if dry_run else ", removing"))
+        if dry_run:
+            cursor.close()
+            return
+        delete_rows(conn, table, duplicates)
+
+    existing = index_names(cursor, table)
+    for index, unique, columns in STATEMENT_INDEXES[table]:
+        if index not in existing:
+            print(f"{table}: creating {index} ({columns})")
+            if not dry_run:
+                cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index} ON {table} ({columns})")
+    for index in LEGACY_INDEXES[table]:
+        if index in existing:
+            print(f"{table}: dropping {index}")
+            if not dry_run:
+                drop_index(cursor, table, index)
+    conn.commit()
+    cursor.close()
+
+
+def main(dry_run=False):
+    conn = connect()
+    try:
+        for table in STATEMENT_INDEXES:
+            migrate_table(conn, table, dry_run)
+    except Error as e:
+        print(f"Index migration stopped: {e}")
+        raise
+    finally:
+        conn.close()
+    print("Dry run, nothing changed." if dry_run else "Statement table indexes are up to date.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move statement tables to (company_id, year) indexes")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report duplicates and the index changes")
+    args = parser.parse_args()
+    main(dry_run=args.dry_run)
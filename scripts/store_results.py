@@ -4,16 +4,20 @@ import os
 import sys
 import json
 import uuid
-import mysql.connector
+import itertools
 from mysql.connector import Error
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config.config import DB_CONFIG
+from config.config import STORE_BATCH_SIZE, RESULTS_SPILL_PATH
+from database.connection import connect
+from database.version import bump_data_version
+from scripts.change_detection import save_fingerprints
+from scripts.instrumentation import stage
 
 PROCESSED_PATH = "data/processed"
 
 def connect_to_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    return connect()
 
 def insert_into_companies(cursor, company):
     query = """
@@ -46,10 +50,10 @@ def insert_into_analysis(cursor, company_id, sales_growth, profit_growth, roe):
     values = (
         str(uuid.uuid4())[:8],  # generate short random ID
         company_id,
-        f"{sales_growth:.2f}%",
-        f"{profit_growth:.2f}%",
-        "0%",  # Placeholder for stock_price_cagr if not available
-        f"{roe:.2f}%"
+        round(sales_growth, 2),
+        round(profit_growth, 2),
+        0,  # Placeholder for stock_price_cagr if not available
+        round(roe, 2)
     )
     cursor.execute(query, values)
 
@@ -66,6 +70,40 @@ def insert_into_prosandcons(cursor, company_id, pros, cons):
     query = "INSERT INTO prosandcons (company_id, pros, cons) VALUES (%s, %s, %s)"
     cursor.executemany(query, records)
 
+def refresh_company_summary(cursor, company_ids=None):
+    """Rebuild company_summary rows from companies, the latest analysis row and pros/cons counts.
+
+    Rebuilds every company by default, or only company_ids when given.
+    The counts are per-company index lookups, so a partial rebuild doesn't
+    read the whole prosandcons table.
+    """
+    # Always a WHERE clause: SQLite needs one before the upsert clause of INSERT ... SELECT
+    where = "WHERE 1 = 1"
+    params = ()
+    if company_ids is not None:
+        company_ids = list(company_ids)
+        if not company_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(company_ids))
+        where = f"WHERE c.id IN ({placeholders})"
+        params = tuple(company_ids)
+    cursor.execute(f"""
+    INSERT INTO company_summary (company_id, company_name, roe_percentage, compounded_sales_growth, compounded_profit_growth, pros_count, cons_count)
+    SELECT c.id, c.company_name, c.roe_percentage,
+           a.compounded_sales_growth, a.compounded_profit_growth,
+           (SELECT COUNT(p.pros) FROM prosandcons p WHERE p.company_id = c.id),
+           (SELECT COUNT(p.cons) FROM prosandcons p WHERE p.company_id = c.id)
+    FROM companies c
+    LEFT JOIN analysis a ON a.id = (
+        SELECT a2.id FROM analysis a2 WHERE a2.company_id = c.id
+        ORDER BY a2.updated_at DESC, a2.id LIMIT 1
+    )
+    {where}
+    ON DUPLICATE KEY UPDATE company_name=VALUES(company_name), roe_percentage=VALUES(roe_percentage),
+        compounded_sales_growth=VALUES(compounded_sales_growth), compounded_profit_growth=VALUES(compounded_profit_growth),
+        pros_count=VALUES(pros_count), cons_count=VALUES(cons_count)
+    """, params)
+
 def compute_growth(data_list, field):
     if len(data_list) < 2:
         return 0.0
@@ -91,33 +129,56 @@ def fetch_profitandloss_from_db(cursor, company_id):
     rows = cursor.fetchall()
     return rows if rows else []  # Already a list of dictionaries when using dictionary=True cursor
 
-def main():
-    conn = connect_to_db()
-    cursor = conn.cursor(dictionary=True)
+def parse_roe(roe_percentage):
+    try:
+        return float(roe_percentage) if roe_percentage is not None and str(roe_percentage).strip() else 0.0
+    except (ValueError, TypeError):
+        return 0.0
 
-    # Get list of processed files (pros/cons from analyze_data.py output)
-    if not os.path.exists(PROCESSED_PATH):
-        print(f"Error: {PROCESSED_PATH} directory not found!")
-        return
-    
-    processed_files = [f for f in os.listdir(PROCESSED_PATH) if f.endswith(".json")]
-    
-    if not processed_files:
-        print("No processed files found. Run analyze_data.py first.")
-        return
+def read_results_spill(path=RESULTS_SPILL_PATH):
+    """Stream results from the JSON Lines file written by analyze_data.py"""
+    with open(path, "r", encoding="utf-8") as spill:
+        for line_no, line in enumerate(spill, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_no} of {path}: invalid JSON - {e}")
 
-    for filename in processed_files:
+def read_processed_files():
+    """Yield results from per-company JSON files (output of older analyze_data.py runs)"""
+    for filename in os.listdir(PROCESSED_PATH):
+        if not filename.endswith(".json"):
+            continue
         company_id = filename.replace(".json", "")
         processed_file = os.path.join(PROCESSED_PATH, filename)
-
         try:
             # Read pros/cons from processed JSON file
             with open(processed_file, "r", encoding="utf-8") as pf:
                 processed_data = json.load(pf)
-            
-            pros = processed_data.get("pros", [])
-            cons = processed_data.get("cons", [])
-            
+        except FileNotFoundError:
+            print(f"Skipping {company_id}: processed file not found")
+            continue
+        except json.JSONDecodeError as e:
+            print(f"Skipping {company_id}: invalid JSON in processed file - {e}")
+            continue
+        processed_data.setdefault("company_id", company_id)
+        yield processed_data
+
+def insert_rows(cursor, table, columns, rows, batch_size=STORE_BATCH_SIZE):
+    """Multi-row INSERT ... VALUES (...),(...), batch_size rows per statement"""
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([row_placeholder] * len(batch))
+        cursor.execute(query, [value for row in batch for value in row])
+
+def store_results_per_company(cursor, results):
+    """Original path: six statements per company. Returns the stored company ids"""
+    stored_ids = []
+    for company_id, pros, cons in results:
+        try:
             # Fetch company data from database
             company = fetch_company_from_db(cursor, company_id)
             if not company:
@@ -131,11 +192,7 @@ def main():
                 continue
             
             # Calculate metrics
-            roe_percentage = company.get("roe_percentage")
-            try:
-                roe = float(roe_percentage) if roe_percentage is not None and str(roe_percentage).strip() else 0.0
-            except (ValueError, TypeError):
-                roe = 0.0
+            roe = parse_roe(company.get("roe_percentage"))
             
             # Get last 6 years of profit/loss data for growth calculation
             pl = pl_data[-6:] if len(pl_data) >= 6 else pl_data
@@ -146,22 +203,186 @@ def main():
             insert_into_companies(cursor, company)
             insert_into_analysis(cursor, company_id, sales_growth, profit_growth, roe)
             insert_into_prosandcons(cursor, company_id, pros, cons)
+            stored_ids.append(company_id)
             print(f"Inserted into all tables: {company_id}")
             
-        except FileNotFoundError:
-            print(f"Skipping {company_id}: processed file not found")
-            continue
-        except json.JSONDecodeError as e:
-            print(f"Skipping {company_id}: invalid JSON in processed file - {e}")
+        except Exception as e:
+            print(f"Error processing {company_id}: {str(e)}")
             continue
+    return stored_ids
+
+def store_results_bulk(cursor, results, batch_size=STORE_BATCH_SIZE):
+    """Store all results with a fixed number of round-trips.
+
+    Companies and P&L rows are prefetched in two queries, old prosandcons
+    rows are removed with one DELETE ... IN, and the new rows go in as
+    multi-row INSERTs of batch_size rows. Analysis rows are added as in
+    insert_into_analysis, existing ones are kept. Returns the stored
+    company ids.
+    """
+    results = list(results)
+    if not results:
+        return []
+    company_ids = [company_id for company_id, _, _ in results]
+    placeholders = ", ".join(["%s"] * len(company_ids))
+
+    with stage("prefetch"):
+        cursor.execute(f"SELECT id, roe_percentage FROM companies WHERE id IN ({placeholders})", company_ids)
+        companies = {row["id"]: row for row in cursor.fetchall()}
+        cursor.execute(f"""
+            SELECT company_id, year, sales, net_profit FROM profitandloss
+            WHERE company_id IN ({placeholders})
+            ORDER BY company_id, year
+        """, company_ids)
+        pl_by_company = {}
+        for row in cursor.fetchall():
+            pl_by_company.setdefault(row["company_id"], []).append(row)
+
+    stored_ids = []
+    analysis_rows = []
+    proscons_rows = []
+    for company_id, pros, cons in results:
+        try:
+            company = companies.get(company_id)
+            if not company:
+                print(f"⚠️ Skipping {company_id}: not found in database")
+                continue
+            pl_data = pl_by_company.get(company_id)
+            if not pl_data:
+                print(f"⚠️ Skipping {company_id}: no profit/loss data in database")
+                continue
+            roe = parse_roe(company.get("roe_percentage"))
+            # Get last 6 years of profit/loss data for growth calculation
+            pl = pl_data[-6:]
+            sales_growth = compute_growth(pl, "sales")
+            profit_growth = compute_growth(pl, "net_profit")
         except Exception as e:
             print(f"Error processing {company_id}: {str(e)}")
             continue
+        stored_ids.append(company_id)
+        analysis_rows.append((str(uuid.uuid4())[:8], company_id, round(sales_growth, 2),
+                              round(profit_growth, 2), 0, round(roe, 2)))
+        proscons_rows.extend((company_id, pro, None) for pro in pros)
+        proscons_rows.extend((company_id, None, con) for con in cons)
 
+    if not stored_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(stored_ids))
+    with stage("delete"):
+        cursor.execute(f"DELETE FROM prosandcons WHERE company_id IN ({placeholders})", stored_ids)
+    with stage("insert"):
+        insert_rows(cursor, "analysis",
+                    ["id", "company_id", "compounded_sales_growth", "compounded_profit_growth", "stock_price_cagr", "roe"],
+                    analysis_rows, batch_size)
+        insert_rows(cursor, "prosandcons", ["company_id", "pros", "cons"], proscons_rows, batch_size)
+    print(f"Stored {len(stored_ids)} companies ({len(proscons_rows)} pros/cons rows)")
+    return stored_ids
+
+def load_results():
+    """Results for a standalone run: the JSON Lines spill, else legacy per-company files"""
+    if os.path.exists(RESULTS_SPILL_PATH):
+        return read_results_spill(RESULTS_SPILL_PATH)
+    if os.path.exists(PROCESSED_PATH):
+        return read_processed_files()
+    print(f"Error: neither {RESULTS_SPILL_PATH} nor {PROCESSED_PATH} found!")
+    return None
+
+def discard_results_spill(path=RESULTS_SPILL_PATH):
+    """Remove the spill once newer results were stored in-process, so a later standalone run can't store it again"""
+    try:
+        os.remove(path)
+        print(f"Removed outdated {path}")
+    except FileNotFoundError:
+        pass
+
+def iter_batches(results, size):
+    """Lists of at most size results, read lazily from any iterable"""
+    results = iter(results)
+    while True:
+        batch = list(itertools.islice(results, size))
+        if not batch:
+            return
+        yield batch
+
+def main(results=None, bulk=True, batch_size=STORE_BATCH_SIZE, full=False):
+    """Store analysis results.
+
+    results is an iterable of {'company_id', 'pros', 'cons', 'fingerprint'}
+    dicts, as returned by analyze_data.main; when omitted they are streamed
+    from disk. They are stored batch_size companies at a time, all in one
+    transaction. Fingerprints are recorded in analysis_state for the stored
+    companies and only their summary rows are rebuilt, unless full=True.
+    """
+    in_process = results is not None
+    if results is None:
+        results = load_results()
+        if results is None:
+            return
+
+    batches = iter_batches(results, batch_size)
+    first = next(batches, None)
+    if first is None and not full:
+        print("No analysis results to store.")
+        if in_process:
+            discard_results_spill()
+        return
+
+    conn = connect_to_db()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Everything below runs in one transaction
+        stored_ids = []
+        for batch in itertools.chain([first] if first else [], batches):
+            fingerprints = {r["company_id"]: r["fingerprint"] for r in batch if r.get("fingerprint")}
+            batch = [(r["company_id"], r.get("pros", []), r.get("cons", [])) for r in batch]
+            if bulk:
+                batch_ids = store_results_bulk(cursor, batch, batch_size)
+            else:
+                batch_ids = store_results_per_company(cursor, batch)
+            with stage("fingerprints"):
+                save_fingerprints(cursor, {company_id: fingerprints[company_id]
+                                           for company_id in batch_ids if company_id in fingerprints}, batch_size)
+            stored_ids.extend(batch_ids)
+        with stage("summary"):
+            refresh_company_summary(cursor, None if full else stored_ids)
+        with stage("commit"):
+            bump_data_version(cursor)
+            conn.commit()
+    except Error as e:
+        print(f"Error storing results, rolled back: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    if in_process:
+        discard_results_spill()
+    print("All companies inserted into MySQL.")
+
+def refresh_summary_only():
+    conn = connect_to_db()
+    cursor = conn.cursor()
+    refresh_company_summary(cursor)
+    bump_data_version(cursor)
     conn.commit()
     cursor.close()
     conn.close()
-    print("All companies inserted into MySQL.")
+    print("company_summary refreshed.")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Store analysis results in MySQL")
+    parser.add_argument("--refresh-summary", action="store_true",
+                        help="Only rebuild the company_summary table used by the listing pages")
+    parser.add_argument("--per-company", action="store_true",
+                        help="Store company by company instead of in bulk")
+    parser.add_argument("--batch-size", type=int, default=STORE_BATCH_SIZE,
+                        help="Rows per multi-row INSERT in bulk mode")
+    parser.add_argument("--full", action="store_true",
+                        help="Rebuild the summary rows of every company, not only the stored ones")
+    args = parser.parse_args()
+    if args.refresh_summary:
+        refresh_summary_only()
+    else:
+        main(bulk=not args.per_company, batch_size=args.batch_size, full=args.full)
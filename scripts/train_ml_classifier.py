@@ -1,50 +1,284 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime, timezone
 import pandas as pd
+import sklearn
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+from sklearn.model_selection import train_test_split, cross_validate, KFold, ParameterSampler
+from sklearn.metrics import classification_report, hamming_loss, make_scorer
 import joblib
 
-def main():
-    """Train ML classifier for financial analysis"""
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.config import MODEL_PATH, MODEL_META_PATH, FLAT_MODEL_DIR, BEST_PARAMS_PATH
+from scripts.features import FEATURE_COLS
+from scripts.flat_forest import export_forest, load_flat_meta, FlatForest
+from scripts.generate_training_data import LABEL_COLS
+from scripts.instrumentation import stage
+
+CSV_PATH = "ml_training_data.csv"
+
+# Model with regularization to prevent overfitting
+MODEL_PARAMS = {
+    "n_estimators": 100,
+    "max_depth": 12,              # Limit tree depth - prevents overfitting
+    "min_samples_split": 8,       # Minimum samples required to split a node
+    "min_samples_leaf": 3,        # Minimum samples required in a leaf node
+    "max_features": 0.8,          # Use 80% of features per split - increases diversity
+    "max_samples": 0.8,           # Use 80% of samples per tree - increases robustness
+    "bootstrap": True,            # Bootstrap sampling
+    "random_state": 42,           # Reproducibility
+    "n_jobs": -1,                 # Use all available CPU cores
+}
+
+# Search space for --tune (sampled at random, see tune())
+PARAM_DISTRIBUTIONS = {
+    "n_estimators": [25, 50, 100, 200],
+    "max_depth": [4, 6, 8, 12, 16, None],
+    "min_samples_split": [2, 4, 8, 16],
+    "min_samples_leaf": [1, 2, 3, 5],
+    "max_features": [0.5, 0.8, 1.0, "sqrt"],
+    "max_samples": [0.6, 0.8, 1.0],
+}
+
+# Candidates whose CV label accuracy is within this of the best count as
+# equally accurate; the fastest of them wins
+TUNE_TOLERANCE = 0.005
+
+# Predict latency is the median over PREDICT_REPEATS calls on a PREDICT_BATCH_ROWS-row batch
+PREDICT_BATCH_ROWS = 64
+PREDICT_REPEATS = 200
+
+def label_accuracy(y_true, y_pred):
+    """Share of correct (company, label) pairs: 1 - hamming loss"""
+    return 1.0 - hamming_loss(y_true, y_pred)
+
+def load_best_params():
+    try:
+        with open(BEST_PARAMS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("params", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def model_params():
+    """MODEL_PARAMS overridden by the result of the last --tune run, if any"""
+    params = dict(MODEL_PARAMS)
+    params.update(load_best_params())
+    return params
+
+def predict_latency_ms(clf, X, batch_rows=PREDICT_BATCH_ROWS, repeats=PREDICT_REPEATS):
+    """Median time of the flat evaluator the pipeline loads to predict a batch of batch_rows distinct rows"""
+    flat = FlatForest.from_classifier(clf)
+    batch = X[:batch_rows]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        flat.predict(batch)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+def tune(n_iter=40, folds=5, budget=None, tolerance=TUNE_TOLERANCE, random_state=42):
+    """Randomized search over PARAM_DISTRIBUTIONS with k-fold CV on all cores.
+
+    Each candidate is scored by label accuracy (and exact-match accuracy)
+    across the folds, with the folds fitted in parallel. Fit time, flat-model
+    predict latency and node count are recorded as well; among the candidates
+    within `tolerance` of the best accuracy the fastest to predict is chosen.
+
+    With a `budget` (seconds), a candidate is skipped when its estimated cost
+    (its tree count times the seconds per tree of the candidates so far)
+    doesn't fit in the time left, and sampling stops once the budget is
+    used. Estimates can be off, so the summary says how far past the
+    budget the run went, if it did. The chosen parameters are written to
+    BEST_PARAMS_PATH, which main() then trains with.
+    """
+    df = pd.read_csv(CSV_PATH)
+    X = df[FEATURE_COLS]
+    y = df[LABEL_COLS]
+    X_sample = X.to_numpy()
+    cv = KFold(n_splits=folds, shuffle=True, random_state=random_state)
+    scoring = {"label_accuracy": make_scorer(label_accuracy), "subset_accuracy": "accuracy"}
+    base = {k: v for k, v in MODEL_PARAMS.items() if k not in PARAM_DISTRIBUTIONS}
+    # Parallelism comes from the folds; a forest per core avoids oversubscription
+    base["n_jobs"] = 1
+
+    print(f"Tuning on {len(df)} records: up to {n_iter} candidates, {folds}-fold CV"
+          + (f", {budget:.0f}s budget" if budget else ""))
+    started = time.perf_counter()
+    results = []
+    spent_s = trees = skipped = 0
+    for i, candidate in enumerate(ParameterSampler(PARAM_DISTRIBUTIONS, n_iter, random_state=random_state)):
+        elapsed = time.perf_counter() - started
+        if budget and elapsed > budget:
+            print(f"Time budget reached after {i} candidates")
+            break
+        if budget and trees:
+            estimate = spent_s / trees * candidate["n_estimators"]
+            if elapsed + estimate > budget:
+                skipped += 1
+                print(f"[{i + 1:>3}] skipped: ~{estimate:.1f}s estimated, {budget - elapsed:.1f}s left  {candidate}")
+                continue
+        candidate_start = time.perf_counter()
+        params = {**base, **candidate}
+        cv_result = cross_validate(RandomForestClassifier(**params), X, y, cv=cv, scoring=scoring,
+                                   n_jobs=-1, return_estimator=True)
+        estimator = cv_result["estimator"][0]
+        result = {
+            "params": candidate,
+            "label_accuracy": float(cv_result["test_label_accuracy"].mean()),
+            "label_accuracy_std": float(cv_result["test_label_accuracy"].std()),
+            "subset_accuracy": float(cv_result["test_subset_accuracy"].mean()),
+            "fit_time_s": float(cv_result["fit_time"].mean()),
+            "predict_ms": predict_latency_ms(estimator, X_sample),
+            "nodes": int(sum(tree.tree_.node_count for tree in estimator.estimators_)),
+        }
+        results.append(result)
+        spent_s += time.perf_counter() - candidate_start
+        trees += candidate["n_estimators"]
+        print(f"[{i + 1:>3}] acc {result['label_accuracy']:.4f} (+/- {result['label_accuracy_std']:.4f}) "
+              f"exact {result['subset_accuracy']:.4f}  fit {result['fit_time_s']:.3f}s  "
+              f"predict {result['predict_ms']:.3f}ms  nodes {result['nodes']}  {candidate}")
+
+    if not results:
+        print("No candidates evaluated - keeping current parameters")
+        return None
+
+    elapsed = time.perf_counter() - started
+    summary = f"Evaluated {len(results)} candidate(s) in {elapsed:.1f}s"
+    if budget:
+        summary += f" ({skipped} skipped as too slow for the budget"
+        summary += (f"; {elapsed - budget:.1f}s past the {budget:.0f}s budget)" if elapsed > budget
+                    else f"; within the {budget:.0f}s budget)")
+    print(summary)
+
+    best_accuracy = max(r["label_accuracy"] for r in results)
+    equal = [r for r in results if r["label_accuracy"] >= best_accuracy - tolerance]
+    best = min(equal, key=lambda r: (r["predict_ms"], r["nodes"], r["fit_time_s"]))
+    print(f"Best label accuracy {best_accuracy:.4f}; {len(equal)} candidate(s) within {tolerance}")
+    print(f"Chosen: acc {best['label_accuracy']:.4f}, predict {best['predict_ms']:.3f}ms, "
+          f"nodes {best['nodes']}, params {best['params']}")
+
+    with open(BEST_PARAMS_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "params": best["params"],
+            "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "training_rows": len(df),
+            "folds": folds,
+            "tolerance": tolerance,
+            "elapsed_s": round(elapsed, 1),
+            "budget_s": budget,
+            "chosen": best,
+            "candidates": sorted(results, key=lambda r: -r["label_accuracy"]),
+        }, f, indent=4)
+    print(f"Best parameters saved to {BEST_PARAMS_PATH}")
+    return best
+
+def model_cache_key(csv_path=CSV_PATH, params=None):
+    """Content hash of everything the fitted model depends on.
+
+    Covers the training CSV bytes, the feature and label columns, the
+    RandomForestClassifier parameters and the scikit-learn version.
+    """
+    if params is None:
+        params = model_params()
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(json.dumps({
+        "features": FEATURE_COLS,
+        "labels": LABEL_COLS,
+        "params": params,
+        "sklearn": sklearn.__version__,
+    }, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def load_model_meta():
+    try:
+        with open(MODEL_META_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def main(force=False):
+    """Train ML classifier for financial analysis.
+
+    Skips training when ml_pros_classifier.joblib was built from the same
+    CSV, columns and parameters (see model_cache_key); force=True retrains.
+    Parameters from the last --tune run (BEST_PARAMS_PATH) override MODEL_PARAMS.
+    """
+    params = model_params()
+    cache_key = model_cache_key(params=params)
+    meta = load_model_meta()
+    if not force and meta and meta.get("key") == cache_key and os.path.exists(MODEL_PATH):
+        print(f"Training data and parameters unchanged - reusing {MODEL_PATH} "
+              f"(trained {meta.get('trained_at')})")
+        flat_meta = load_flat_meta()
+        if not flat_meta or flat_meta.get("key") != cache_key:
+            export_forest(joblib.load(MODEL_PATH), FLAT_MODEL_DIR, extra_meta={"key": cache_key})
+            print(f"Flat model exported to {FLAT_MODEL_DIR}/")
+        return
+
     print("Training ML classifier...")
     
     # Load data
-    csv_path = "ml_training_data.csv"
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(CSV_PATH)
     print(f"Loaded training data: {len(df)} records")
 
     # Features and labels
-    feature_cols = ["roe", "dividend_payout", "sales_growth", "debt_ratio"]
-    label_cols = ["pro_roe", "pro_dividend", "pro_sales", "pro_debt"]
-
-    X = df[feature_cols]
-    y = df[label_cols]
+    X = df[FEATURE_COLS]
+    y = df[LABEL_COLS]
 
     # Train/test split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # Train model with regularization to prevent overfitting
-    clf = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=12,              # Limit tree depth - prevents overfitting
-        min_samples_split=8,       # Minimum samples required to split a node
-        min_samples_leaf=3,        # Minimum samples required in a leaf node
-        max_features=0.8,          # Use 80% of features per split - increases diversity
-        max_samples=0.8,           # Use 80% of samples per tree - increases robustness
-        bootstrap=True,            # Bootstrap sampling
-        random_state=42,           # Reproducibility
-        n_jobs=-1                  # Use all available CPU cores
-    )
-    clf.fit(X_train, y_train)
+    # Train model
+    clf = RandomForestClassifier(**params)
+    with stage("fit"):
+        clf.fit(X_train, y_train)
 
     # Evaluate
-    y_pred = clf.predict(X_test)
+    with stage("evaluate"):
+        y_pred = clf.predict(X_test)
     print("Classification report (per label):")
-    print(classification_report(y_test, y_pred, target_names=label_cols))
+    print(classification_report(y_test, y_pred, target_names=LABEL_COLS))
+
+    # Save model, then the metadata that marks it as current
+    with stage("save"):
+        joblib.dump(clf, MODEL_PATH)
+        with open(MODEL_META_PATH, "w", encoding="utf-8") as f:
+            json.dump({
+                "key": cache_key,
+                "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "training_rows": len(df),
+                "features": FEATURE_COLS,
+                "labels": LABEL_COLS,
+                "params": params,
+                "sklearn": sklearn.__version__,
+            }, f, indent=4)
+    print(f"Model trained and saved as {MODEL_PATH}")
 
-    # Save model
-    joblib.dump(clf, "ml_pros_classifier.joblib")
-    print("Model trained and saved as ml_pros_classifier.joblib")
+    # Memory-mappable NumPy export used for fast loading (scripts/flat_forest.py)
+    with stage("export_flat"):
+        export_forest(clf, FLAT_MODEL_DIR, extra_meta={"key": cache_key})
+    print(f"Flat model exported to {FLAT_MODEL_DIR}/")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the pros classifier")
+    parser.add_argument("--force", action="store_true",
+                        help="Retrain even if the cached model matches the training data and parameters")
+    parser.add_argument("--tune", action="store_true",
+                        help=f"Search forest parameters with k-fold CV, save the best to {BEST_PARAMS_PATH}, then train")
+    parser.add_argument("--iterations", type=int, default=40, help="Candidates sampled by --tune")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for --tune")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Wall-clock budget for --tune in seconds: candidates estimated not to finish in "
+                             "time are skipped; the last one can still run past it")
+    args = parser.parse_args()
+    if args.tune:
+        tune(n_iter=args.iterations, folds=args.folds, budget=args.budget)
+    main(force=args.force)
@@ -0,0 +1,83 @@
+# tests/test_json_stream.py
+#
+# scripts/json_stream.py must yield the same records as json.loads however
+# the file is cut into reads.
+#
+#     python -m pytest -q tests
+
+import io
+import os
+import sys
+import json
+import random
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.json_stream import iter_records
+
+COMPANY_FILE = json.dumps({
+    "company": {"id": "ABC", "company_name": "ABC Ltd", "roe_percentage": 12.5, "face_value": 1e1},
+    "elapsed": 12.5,
+    "data": {
+        "profitandloss": [
+            {"year": "Mar 2023", "sales": 1200.75, "net_profit": -3.25e-2, "eps": 0, "tax_percentage": "25%"},
+            {"year": "Mar 2024", "sales": 1350, "net_profit": 140.0, "eps": 1.5E+2, "tax_percentage": None},
+        ],
+        "balancesheet": [{"year": "Mar 2024", "borrowings": 100, "total_liabilities": 2500.125, "flag": True}],
+        "cashflow": [],
+    },
+}, indent=1)
+
+BULK_FILE = json.dumps([
+    {"company": {"id": "A", "score": -0.5}, "data": {"cashflow": [{"year": "Mar 2024", "net_cash_flow": 7e-3}]}},
+    {"data": {"profitandloss": [{"year": "Mar 2024", "sales": 99.99}]}, "company": {"id": "B", "score": 10}},
+])
+
+
+class SplitReader(io.StringIO):
+    """Text file whose first read stops at split, then returns at most step characters per read"""
+
+    def __init__(self, text, split, step):
+        super().__init__(text)
+        self._next = split
+        self._step = step
+
+    def read(self, size=-1):
+        limit, self._next = self._next, self._step
+        return super().read(limit if size < 0 else min(size, limit))
+
+
+def expected_records(text):
+    doc = json.loads(text)
+    records = []
+    for item in doc if isinstance(doc, list) else [doc]:
+        records.append(("companies", item["company"]))
+        for table, rows in item["data"].items():
+            records.extend((table, row) for row in rows)
+    return records
+
+
+def read_all(text, split, step):
+    return list(iter_records(SplitReader(text, split, step), chunk_size=len(text)))
+
+
+def test_every_split_offset():
+    for text in (COMPANY_FILE, BULK_FILE):
+        expected = expected_records(text)
+        for split in range(1, len(text) + 1):
+            assert read_all(text, split, len(text)) == expected, f"split at {split}: {text[split - 5:split]!r}"
+
+
+def test_number_cut_after_point_or_exponent():
+    text = '{"company":{"id":"X"},"elapsed":12.5,"data":{"cashflow":[{"v":1e+5},{"v":-2.5E-3}]}}'
+    expected = expected_records(text)
+    for prefix in ('"elapsed":12.', '"v":1e', '"v":1e+', '"v":-', '"v":-2.5E'):
+        split = text.index(prefix) + len(prefix)
+        assert read_all(text, split, len(text)) == expected, prefix
+
+
+def test_small_random_reads():
+    rng = random.Random(7)
+    for text in (COMPANY_FILE, BULK_FILE):
+        expected = expected_records(text)
+        for _ in range(50):
+            assert read_all(text, rng.randint(1, 7), rng.randint(1, 7)) == expected
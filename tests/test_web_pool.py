@@ -0,0 +1,77 @@
+# tests/test_web_pool.py
+#
+# get_db_connection() and the request teardown with and without pooling
+# (pool_size=0 is what scripts/bench_web.py uses for its baseline).
+#
+#     python -m pytest -q tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database.pool import ConnectionPool
+import web.app as web_app
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed_count = 0
+        self.rollbacks = 0
+        self.in_transaction = True
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.closed_count += 1
+
+
+@pytest.fixture
+def pool(monkeypatch, request):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    pool = ConnectionPool({}, pool_size=request.param)
+    monkeypatch.setattr(pool, "_connect", connect)
+    monkeypatch.setattr(web_app, "db_pool", pool)
+    pool.opened = opened
+    return pool
+
+
+@pytest.mark.parametrize("pool", [0], indirect=True)
+def test_unpooled_connection_closed_at_teardown(pool):
+    with web_app.app.test_request_context("/"):
+        conn = web_app.get_db_connection()
+        assert web_app.get_db_connection() is conn
+        assert len(pool.opened) == 1
+    assert [c.closed_count for c in pool.opened] == [1]
+
+
+@pytest.mark.parametrize("pool", [0], indirect=True)
+def test_unpooled_connection_closed_early_is_replaced(pool):
+    with web_app.app.test_request_context("/"):
+        first = web_app.get_db_connection()
+        first.close()
+        second = web_app.get_db_connection()
+        assert second is not first
+        assert not second.closed
+    # Each raw connection is closed exactly once: the early close() and the teardown
+    assert [c.closed_count for c in pool.opened] == [1, 1]
+
+
+@pytest.mark.parametrize("pool", [1], indirect=True)
+def test_pooled_connection_returned_and_reused(pool):
+    for _ in range(2):
+        with web_app.app.test_request_context("/"):
+            web_app.get_db_connection()
+    assert len(pool.opened) == 1
+    assert pool.opened[0].closed_count == 0
+    assert pool.opened[0].rollbacks == 2
@@ -1,51 +1,150 @@
-from flask import Flask, render_template, request
-import mysql.connector
+from flask import Flask, render_template, request, g, jsonify
 import sys, os
+import json
+import math
+import time
+import base64
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
-from config.config import DB_CONFIG
+from config.config import DB_CONFIG, DB_POOL_CONFIG, DATA_VERSION_CHECK_INTERVAL, WEB_CACHE_CONFIG, SCORING_CONFIG
+from database.pool import ConnectionPool
+from database.version import DataVersionWatcher
+from web.search_index import SearchIndexHolder
+from web.cache import TTLCache
+from web.scoring import MicroBatcher, score_payload
+from web.series import load_series, choose_encoding, encode_body
+from web.screener import METRICS, ScreenerError, ScreenerHolder, SNAPSHOT_QUERY, DEFAULT_LIMIT, MAX_LIMIT, parse_filters
+from scripts.features import FEATURE_COLS, compute_features, load_feature_frames
 
 app = Flask(__name__)
 
+db_pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+
 def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Pooled connection for the current request.
 
-@app.route("/")
-def home():
-    """Full company listing page"""
+    Routes may close() it early to hand it back; otherwise it is returned
+    to the pool when the request ends, including on error paths.
+    """
+    conn = g.get("db_conn")
+    if conn is None or getattr(conn, "closed", False):
+        conn = g.db_conn = db_pool.acquire()
+    return conn
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+data_version = DataVersionWatcher(DATA_VERSION_CHECK_INTERVAL)
+search_index = SearchIndexHolder()
+screener = ScreenerHolder()
+page_cache = TTLCache(maxsize=WEB_CACHE_CONFIG["company_page_maxsize"], ttl=WEB_CACHE_CONFIG["company_page_ttl"])
+count_cache = TTLCache(maxsize=1, ttl=WEB_CACHE_CONFIG["processed_count_ttl"])
+series_cache = TTLCache(maxsize=WEB_CACHE_CONFIG["series_maxsize"], ttl=WEB_CACHE_CONFIG["series_ttl"])
+scorer = MicroBatcher(**SCORING_CONFIG)
+
+def load_search_rows():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, company_name, about_company FROM companies")
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def get_search_index():
+    """Search index for the current data version, rebuilt after each store run"""
+    return search_index.get(data_version.current(get_db_connection), load_search_rows)
+
+SEARCH_RESULT_LIMIT = 60
+
+SUMMARY_COLUMNS = """company_id, company_name, roe_percentage,
+               compounded_sales_growth, compounded_profit_growth,
+               pros_count, cons_count"""
+
+def encode_cursor(row):
+    """Opaque pagination cursor for a listing row: base64 of [company_name, company_id]"""
+    raw = json.dumps([row[1], row[0]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor_value):
+    """Inverse of encode_cursor; returns (company_name, company_id) or None if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor_value + "=" * (-len(cursor_value) % 4))
+        company_name, company_id = json.loads(raw)
+        return str(company_name), str(company_id)
+    except Exception:
+        return None
+
+def render_company_listing():
+    """Paginated company grid, read from the precomputed company_summary table.
+
+    Previous/Next use keyset pagination on (company_name, company_id) via
+    the ?after= / ?before= cursors; ?page=N still works with OFFSET for old
+    links and for jumping to a page number. With a cursor, page is only
+    used for display.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # Get page parameter for pagination
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     per_page = 24  # 6x4 grid
-    offset = (page - 1) * per_page
-    
-    # Get companies with pagination
-    cursor.execute("""
-        SELECT c.id, c.company_name, c.roe_percentage, 
-               a.compounded_sales_growth, a.compounded_profit_growth,
-               COUNT(pc.pros) as pros_count,
-               COUNT(pc.cons) as cons_count
-        FROM companies c
-        LEFT JOIN analysis a ON c.id = a.company_id
-        LEFT JOIN prosandcons pc ON c.id = pc.company_id
-        GROUP BY c.id, c.company_name, c.roe_percentage, a.compounded_sales_growth, a.compounded_profit_growth
-        ORDER BY c.company_name
-        LIMIT %s OFFSET %s
-    """, (per_page, offset))
+    after = decode_cursor(request.args.get('after', ''))
+    before = decode_cursor(request.args.get('before', ''))
     
-    companies = cursor.fetchall()
+    # Fetch one extra row to know whether another page exists in that direction
+    if after:
+        cursor.execute(f"""
+            SELECT {SUMMARY_COLUMNS}
+            FROM company_summary
+            WHERE company_name >= %s AND (company_name > %s OR company_id > %s)
+            ORDER BY company_name, company_id
+            LIMIT %s
+        """, (after[0], after[0], after[1], per_page + 1))
+        companies = cursor.fetchall()
+        has_next = len(companies) > per_page
+        companies = companies[:per_page]
+        has_prev = True
+    elif before:
+        cursor.execute(f"""
+            SELECT {SUMMARY_COLUMNS}
+            FROM company_summary
+            WHERE company_name <= %s AND (company_name < %s OR company_id < %s)
+            ORDER BY company_name DESC, company_id DESC
+            LIMIT %s
+        """, (before[0], before[0], before[1], per_page + 1))
+        companies = cursor.fetchall()
+        has_prev = len(companies) > per_page
+        companies = companies[:per_page][::-1]
+        has_next = True
+    else:
+        # Page-number fallback
+        offset = (page - 1) * per_page
+        cursor.execute(f"""
+            SELECT {SUMMARY_COLUMNS}
+            FROM company_summary
+            ORDER BY company_name, company_id
+            LIMIT %s OFFSET %s
+        """, (per_page + 1, offset))
+        companies = cursor.fetchall()
+        has_next = len(companies) > per_page
+        companies = companies[:per_page]
+        has_prev = page > 1
     
     # Get total count
-    cursor.execute("SELECT COUNT(*) FROM companies")
+    cursor.execute("SELECT COUNT(*) FROM company_summary")
     total_companies = cursor.fetchone()[0]
     
     # Calculate pagination info
     total_pages = (total_companies + per_page - 1) // per_page
-    has_prev = page > 1
-    has_next = page < total_pages
+    next_cursor = encode_cursor(companies[-1]) if has_next and companies else None
+    prev_cursor = encode_cursor(companies[0]) if has_prev and companies else None
     
     conn.close()
     
@@ -54,11 +153,35 @@ def home():
                          total_companies=total_companies,
                          page=page,
                          total_pages=total_pages,
-                         has_prev=has_prev,
-                         has_next=has_next)
+                         has_prev=prev_cursor is not None,
+                         has_next=next_cursor is not None,
+                         prev_cursor=prev_cursor,
+                         next_cursor=next_cursor)
+
+@app.route("/")
+def home():
+    """Full company listing page"""
+    return render_company_listing()
+
+def get_processed_count(cursor):
+    """Number of companies with pros/cons data; global, so cached once per data version"""
+    processed_count = count_cache.get("processed_count")
+    if processed_count is None:
+        cursor.execute("SELECT COUNT(DISTINCT company_id) as count FROM prosandcons")
+        processed_count = cursor.fetchone()['count']
+        count_cache.set("processed_count", processed_count)
+    return processed_count
 
 @app.route("/company/<company_id>")
 def company(company_id):
+    # Rendered pages are cached until they expire or the pipeline stores new data
+    version = data_version.current(get_db_connection)
+    page_cache.check_version(version)
+    count_cache.check_version(version)
+    cached_page = page_cache.get(company_id)
+    if cached_page is not None:
+        return cached_page
+
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True, buffered=True)
 
@@ -78,8 +201,7 @@ def company(company_id):
         pros_cons = cursor.fetchall()
 
         # Count processed companies (those with pros/cons data) for ML insights
-        cursor.execute("SELECT COUNT(DISTINCT company_id) as count FROM prosandcons")
-        processed_count = cursor.fetchone()['count']
+        processed_count = get_processed_count(cursor)
 
         cursor.close()
         conn.close()
@@ -95,13 +217,15 @@ def company(company_id):
 
         show_insights = processed_count >= 70
 
-        return render_template("company.html", 
+        page = render_template("company.html", 
                              company=company, 
                              analysis=analysis, 
                              pros=pros, 
                              cons=cons, 
                              show_insights=show_insights, 
                              processed_count=processed_count)
+        page_cache.set(company_id, page)
+        return page
     except Exception as e:
         try:
             cursor.close()
@@ -113,79 +237,220 @@ def company(company_id):
 @app.route("/companies")
 def companies():
     """Full company listing page"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get page parameter for pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 24  # 6x4 grid
-    offset = (page - 1) * per_page
-    
-    # Get companies with pagination
-    cursor.execute("""
-        SELECT c.id, c.company_name, c.roe_percentage, 
-               a.compounded_sales_growth, a.compounded_profit_growth,
-               COUNT(pc.pros) as pros_count,
-               COUNT(pc.cons) as cons_count
-        FROM companies c
-        LEFT JOIN analysis a ON c.id = a.company_id
-        LEFT JOIN prosandcons pc ON c.id = pc.company_id
-        GROUP BY c.id, c.company_name, c.roe_percentage, a.compounded_sales_growth, a.compounded_profit_growth
-        ORDER BY c.company_name
-        LIMIT %s OFFSET %s
-    """, (per_page, offset))
-    
-    companies = cursor.fetchall()
-    
-    # Get total count
-    cursor.execute("SELECT COUNT(*) FROM companies")
-    total_companies = cursor.fetchone()[0]
-    
-    # Calculate pagination info
-    total_pages = (total_companies + per_page - 1) // per_page
-    has_prev = page > 1
-    has_next = page < total_pages
-    
-    conn.close()
-    
-    return render_template("companies.html", 
-                         companies=companies,
-                         total_companies=total_companies,
-                         page=page,
-                         total_pages=total_pages,
-                         has_prev=has_prev,
-                         has_next=has_next)
+    return render_company_listing()
 
 @app.route("/search")
 def search():
-    """Search companies by name"""
+    """Search companies by name, id or description, best matches first"""
     query = request.args.get('q', '').strip()
     
     if not query:
         return render_template("search.html", query=None, companies=None)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Search for companies matching the query
-    cursor.execute("""
-        SELECT c.id, c.company_name, c.roe_percentage, 
-               a.compounded_sales_growth, a.compounded_profit_growth,
-               COUNT(pc.pros) as pros_count,
-               COUNT(pc.cons) as cons_count
-        FROM companies c
-        LEFT JOIN analysis a ON c.id = a.company_id
-        LEFT JOIN prosandcons pc ON c.id = pc.company_id
-        WHERE c.company_name LIKE %s
-        GROUP BY c.id, c.company_name, c.roe_percentage, a.compounded_sales_growth, a.compounded_profit_growth
-        ORDER BY c.company_name
-    """, (f"%{query}%",))
-    
-    companies = cursor.fetchall()
-    conn.close()
+    ranked = get_search_index().search(query, limit=SEARCH_RESULT_LIMIT)
+    companies = []
+    if ranked:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        placeholders = ', '.join(['%s'] * len(ranked))
+        cursor.execute(f"""
+            SELECT {SUMMARY_COLUMNS}
+            FROM company_summary
+            WHERE company_id IN ({placeholders})
+        """, tuple(company_id for company_id, _, _ in ranked))
+        rows_by_id = {row[0]: row for row in cursor.fetchall()}
+        conn.close()
+        # Keep the index ranking
+        companies = [rows_by_id[company_id] for company_id, _, _ in ranked if company_id in rows_by_id]
     
     return render_template("search.html", query=query, companies=companies)
 
+@app.route("/api/search/autocomplete")
+def search_autocomplete():
+    """Ranked name suggestions as JSON, answered from the in-process index"""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    results = get_search_index().search(query, limit=limit)
+    return jsonify([
+        {"id": company_id, "name": company_name, "score": score}
+        for company_id, company_name, score in results
+    ])
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Hit/miss/eviction counters for sizing the in-process caches"""
+    return jsonify({
+        "data_version": data_version.current(get_db_connection),
+        "company_pages": page_cache.stats(),
+        "processed_count": count_cache.stats(),
+        "series": series_cache.stats(),
+    })
+
+def series_response(body, etag, content_encoding=None, status=200):
+    response = app.response_class(body, status=status, mimetype="application/json")
+    if content_encoding:
+        response.headers["Content-Encoding"] = content_encoding
+    response.set_etag(etag, weak=True)
+    # Always revalidate; an unchanged data version answers 304 without touching the statement tables
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.route("/api/company/<company_id>/series")
+def company_series(company_id):
+    """Yearly statement history as columnar JSON (see web/series.py), gzip/brotli, ETag per data version"""
+    version = data_version.current(get_db_connection)
+    series_cache.check_version(version)
+    etag = f"series-{company_id}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        return series_response(b"", etag, status=304)
+
+    encoding = choose_encoding(request.accept_encodings)
+    cached = series_cache.get((company_id, encoding))
+    if cached is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM companies WHERE id = %s", (company_id,))
+            if cursor.fetchone() is None:
+                return jsonify({"error": f"Company '{company_id}' not found"}), 404
+            tables = load_series(cursor, company_id)
+        finally:
+            cursor.close()
+        cached = encode_body({"company_id": company_id, "data_version": version, "tables": tables}, encoding)
+        series_cache.set((company_id, encoding), cached)
+    body, content_encoding = cached
+    return series_response(body, etag, content_encoding)
+
+def load_company_features(company_id):
+    """Current model features of one company, computed from its rows right now"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        features = compute_features(*load_feature_frames(cursor, [company_id]))
+    finally:
+        cursor.close()
+    if features.empty:
+        return None
+    return {col: float(features[col].iloc[0]) for col in FEATURE_COLS}
+
+def score_response(features, company_id=None):
+    try:
+        result = score_payload(scorer, features)
+    except Exception as e:
+        return jsonify({"error": f"Scoring failed: {type(e).__name__}: {e}"}), 503
+    return jsonify({"company_id": company_id, **result})
+
+@app.route("/api/score/<company_id>")
+def score_company(company_id):
+    """Live pros/cons for a company from its current financials, without a pipeline run"""
+    features = load_company_features(company_id)
+    if features is None:
+        return jsonify({"error": f"Company '{company_id}' not found"}), 404
+    return score_response(features, company_id)
+
+@app.route("/api/score", methods=["POST"])
+def score_features():
+    """What-if scoring from raw feature values.
+
+    JSON body: any of roe, dividend_payout, sales_growth, debt_ratio (at the
+    top level or under "features"). With "company_id" the given values
+    override that company's current features; otherwise missing ones are 0.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    overrides = body.get("features", body)
+    if not isinstance(overrides, dict):
+        return jsonify({"error": "'features' must be an object"}), 400
+
+    company_id = body.get("company_id")
+    if company_id:
+        features = load_company_features(str(company_id))
+        if features is None:
+            return jsonify({"error": f"Company '{company_id}' not found"}), 404
+    elif not any(col in overrides for col in FEATURE_COLS):
+        return jsonify({"error": f"Provide company_id or at least one of {', '.join(FEATURE_COLS)}"}), 400
+    else:
+        features = {col: 0.0 for col in FEATURE_COLS}
+
+    for col in FEATURE_COLS:
+        if col not in overrides:
+            continue
+        try:
+            value = float(overrides[col])
+        except (TypeError, ValueError):
+            value = math.nan
+        if not math.isfinite(value):
+            return jsonify({"error": f"'{col}' must be a finite number"}), 400
+        features[col] = value
+    return score_response(features, company_id)
+
+@app.route("/api/score/stats")
+def score_stats():
+    """Micro-batching counters of the in-process scorer"""
+    return jsonify(scorer.stats())
+
+def load_screener_rows():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(SNAPSHOT_QUERY)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def run_screen(args):
+    """Screen from request args: q (filters), sort, order, limit, offset. Raises ScreenerError"""
+    start = time.perf_counter()
+    query = args.get("q", "").strip()
+    filters = parse_filters(query)
+    sort = args.get("sort", "roe").strip().lower()
+    order = args.get("order", "desc").strip().lower()
+    if order not in ("asc", "desc"):
+        raise ScreenerError("order must be 'asc' or 'desc'")
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+        offset = int(args.get("offset", 0))
+    except ValueError:
+        raise ScreenerError("limit and offset must be integers")
+    if not 1 <= limit <= MAX_LIMIT or offset < 0:
+        raise ScreenerError(f"limit must be 1-{MAX_LIMIT} and offset >= 0")
+    snapshot = screener.get(data_version.current(get_db_connection), load_screener_rows)
+    matched, companies = snapshot.screen(filters, sort, order == "desc", limit, offset)
+    return {
+        "q": query,
+        "filters": [{"metric": metric, "op": op, "value": value} for metric, op, value in filters],
+        "sort": sort,
+        "order": order,
+        "limit": limit,
+        "offset": offset,
+        "universe": len(snapshot),
+        "matched": matched,
+        "companies": companies,
+        "data_version": snapshot.version,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+@app.route("/screener")
+def screener_page():
+    """Filter and rank companies by financial metrics"""
+    error = result = None
+    if request.args:
+        try:
+            result = run_screen(request.args)
+        except ScreenerError as e:
+            error = str(e)
+    return render_template("screener.html", metrics=METRICS, args=request.args, result=result, error=error,
+                           max_limit=MAX_LIMIT)
+
+@app.route("/api/screener")
+def screener_api():
+    """JSON screen, e.g. /api/screener?q=roe>20,debt_ratio<0.1&sort=profit_growth&limit=20"""
+    try:
+        return jsonify(run_screen(request.args))
+    except ScreenerError as e:
+        return jsonify({"error": str(e), "metrics": list(METRICS)}), 400
+
 if __name__ == "__main__":
      port = int(os.environ.get("PORT", 5000))
      app.run(host="0.0.0.0", port=port)
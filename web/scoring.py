@@ -0,0 +1,140 @@
+# web/scoring.py
+#
+# Live scoring for /api/score. The classifier is loaded once per process
+# (the flat NumPy forest when it is current, see scripts/flat_forest.py) and
+# a single background thread runs the predictions. Requests that arrive
+# while a prediction is in flight are queued and answered together by the
+# next predict_proba call, so throughput grows with load without adding
+# latency to a lone request.
+
+import time
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+from scripts.classifier import load_classifier, predictions_to_text
+from scripts.features import FEATURE_COLS
+from scripts.generate_training_data import LABEL_COLS
+
+
+def score_batch(clf, X):
+    """[(predictions, probabilities)] per row of X from one predict_proba call.
+
+    Predictions are the most probable class per label, exactly what
+    clf.predict returns; probabilities are P(label == 1).
+    """
+    proba = clf.predict_proba(X)
+    classes = clf.classes_
+    if not isinstance(proba, list):
+        proba, classes = [proba], [classes]
+    predictions = np.column_stack([c.take(np.argmax(p, axis=1)) for p, c in zip(proba, classes)])
+    positive = np.column_stack([
+        p[:, list(c).index(1)] if 1 in c else np.zeros(len(p))
+        for p, c in zip(proba, classes)
+    ])
+    return list(zip(predictions, positive))
+
+
+class _Pending:
+    __slots__ = ("row", "result", "error", "done")
+
+    def __init__(self, row):
+        self.row = row
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Folds concurrent score requests into batched predict calls on one thread"""
+
+    def __init__(self, load_model=load_classifier, max_batch=64, max_wait_ms=0, timeout=5):
+        self.load_model = load_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.clf = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                # Load before accepting work so a missing model fails the request, not the thread
+                self.clf = self.load_model()
+                self._thread = threading.Thread(target=self._run, name="score-batcher", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                X = pd.DataFrame([pending.row for pending in batch], columns=FEATURE_COLS)
+                for pending, result in zip(batch, score_batch(self.clf, X)):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                self.requests += len(batch)
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(batch))
+                for pending in batch:
+                    pending.done.set()
+
+    def score(self, features):
+        """Score one FEATURE_COLS row; returns (predictions, probabilities)"""
+        if self._thread is None:
+            self._start()
+        pending = _Pending([float(v) for v in features])
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            raise TimeoutError(f"No prediction within {self.timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        return {
+            "model_loaded": self.clf is not None,
+            "model": type(self.clf).__name__ if self.clf is not None else None,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize(),
+        }
+
+
+def score_payload(batcher, features):
+    """JSON-ready score for a {feature: value} dict, the same text as the pipeline writes"""
+    row = [features[col] for col in FEATURE_COLS]
+    predictions, probabilities = batcher.score(row)
+    pros, cons = predictions_to_text(row, predictions)
+    return {
+        "features": {col: features[col] for col in FEATURE_COLS},
+        "pros": pros,
+        "cons": cons,
+        "predictions": {label: bool(p) for label, p in zip(LABEL_COLS, predictions)},
+        "probabilities": {label: round(float(p), 4) for label, p in zip(LABEL_COLS, probabilities)},
+    }
@@ -0,0 +1,162 @@
+# web/screener.py
+#
+# Stock screener over per-company metrics: the four model features (ROE,
+# latest dividend payout, 5-year sales growth, debt ratio, defined as in
+# scripts/features.py) plus profit growth and the pros/cons counts.
+#
+# The metrics are read once per data version into a columnar snapshot (one
+# NumPy array per metric, companies in name order). Sort orders are computed
+# once per metric and direction, so a screen is a few vectorized comparisons
+# and a gather; no SQL and no sorting per request.
+# Filters are written like "roe > 20, debt_ratio < 0.1, sales_growth >= 50".
+
+import re
+import operator
+import threading
+
+import numpy as np
+
+# metric -> label; also the accepted names in filters and sort
+METRICS = {
+    "roe": "ROE %",
+    "dividend_payout": "Dividend payout %",
+    "sales_growth": "Sales growth %",
+    "profit_growth": "Profit growth %",
+    "debt_ratio": "Debt ratio",
+    "pros_count": "Pros",
+    "cons_count": "Cons",
+}
+
+# company_summary plus the two features it doesn't store, from the latest
+# statement rows (covering-index lookups, see database_schema.sql)
+SNAPSHOT_QUERY = """
+    SELECT s.company_id, s.company_name,
+           s.roe_percentage AS roe,
+           COALESCE((
+               SELECT p.dividend_payout FROM profitandloss p
+               WHERE p.company_id = s.company_id AND p.dividend_payout > 0
+               ORDER BY p.year DESC LIMIT 1
+           ), 0) AS dividend_payout,
+           s.compounded_sales_growth AS sales_growth,
+           s.compounded_profit_growth AS profit_growth,
+           COALESCE((
+               SELECT COALESCE(b.borrowings, 0) * 1.0 / NULLIF(b.total_liabilities, 0) FROM balancesheet b
+               WHERE b.company_id = s.company_id
+               ORDER BY b.year DESC LIMIT 1
+           ), 0) AS debt_ratio,
+           s.pros_count, s.cons_count
+    FROM company_summary s
+    ORDER BY s.company_name, s.company_id
+"""
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+
+_FILTER_RE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|>|<|=)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*%?\s*$")
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class ScreenerError(ValueError):
+    """Bad filter, sort or limit; the message is safe to show to the user"""
+
+
+def parse_filters(text):
+    """"roe > 20, debt_ratio < 0.1" -> [("roe", ">", 20.0), ("debt_ratio", "<", 0.1)]"""
+    filters = []
+    for part in re.split(r"[,;\n]| and ", text or "", flags=re.IGNORECASE):
+        if not part.strip():
+            continue
+        match = _FILTER_RE.match(part)
+        if not match:
+            raise ScreenerError(f"Can't read filter '{part.strip()}'; use e.g. roe > 20")
+        metric, op, value = match.group(1).lower(), match.group(2), float(match.group(3))
+        if metric not in METRICS:
+            raise ScreenerError(f"Unknown metric '{metric}'; use one of {', '.join(METRICS)}")
+        filters.append((metric, op, value))
+    return filters
+
+
+def _column(values):
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+class ScreenerSnapshot:
+    """Columnar copy of the screener metrics for one data version"""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        rows = list(rows)
+        self.ids = [row[0] for row in rows]
+        self.names = [row[1] for row in rows]
+        self.columns = {metric: _column(row[2 + i] for row in rows) for i, metric in enumerate(METRICS)}
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def screen(self, filters=(), sort="roe", descending=True, limit=DEFAULT_LIMIT, offset=0):
+        """(matched count, [row dicts]) for the companies passing every filter.
+
+        Companies without a value for a filtered metric don't match; without
+        a value for the sort metric they come last. Ties keep name order.
+        """
+        if sort not in METRICS:
+            raise ScreenerError(f"Unknown sort metric '{sort}'; use one of {', '.join(METRICS)}")
+        mask = np.ones(len(self.ids), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for metric, op, value in filters:
+                mask &= OPERATORS[op](self.columns[metric], value)
+        order = self.sort_order(sort, descending)
+        matched = order[mask[order]]
+        return len(matched), [self.row(i) for i in matched[offset:offset + limit]]
+
+    def sort_order(self, metric, descending):
+        """Row indexes sorted by metric, computed once per snapshot and direction"""
+        key = (metric, descending)
+        order = self._orders.get(key)
+        if order is None:
+            with self._lock:
+                order = self._orders.get(key)
+                if order is None:
+                    values = self.columns[metric]
+                    # argsort puts NaN last; negating keeps it last for descending order
+                    order = self._orders[key] = np.argsort(-values if descending else values, kind="stable")
+        return order
+
+    def row(self, i):
+        row = {"id": self.ids[i], "name": self.names[i]}
+        for metric, values in self.columns.items():
+            value = values[i]
+            if np.isnan(value):
+                row[metric] = None
+            elif metric.endswith("_count"):
+                row[metric] = int(value)
+            else:
+                row[metric] = round(float(value), 4)
+        return row
+
+
+class ScreenerHolder:
+    """Keeps the current ScreenerSnapshot and reloads it when the data version moves"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, version, load_rows):
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = ScreenerSnapshot(load_rows(), version=version)
+            return self._snapshot
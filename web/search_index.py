@@ -0,0 +1,123 @@
+# web/search_index.py
+#
+# In-process search index over company id, name and description. Built from
+# the companies table on first use and rebuilt whenever the data version
+# changes (see database/version.py). Lookups are dictionary hits on token
+# prefixes plus trigram candidates for substrings, so a query over a few
+# thousand companies takes well under a millisecond.
+
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Score weights, highest first
+SCORE_EXACT_ID = 100
+SCORE_NAME_PREFIX = 50
+SCORE_TOKEN_EXACT = 15
+SCORE_TOKEN_PREFIX = 10
+SCORE_ID_PREFIX = 8
+SCORE_SUBSTRING = 5
+SCORE_ABOUT = 2
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, rows=(), version=None):
+        """rows are (company_id, company_name, about_company) tuples"""
+        self.version = version
+        self.ids = []
+        self.names = []
+        self._search_names = []     # lowercased name, for substring checks
+        self._prefixes = {}         # name/id token prefix -> {doc: score}
+        self._trigrams = {}         # trigram of lowercased name -> {doc}
+        self._about = {}            # description token -> {doc}
+        for company_id, company_name, about_company in rows:
+            self._add(str(company_id), company_name or "", about_company or "")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _add(self, company_id, company_name, about_company):
+        doc = len(self.ids)
+        self.ids.append(company_id)
+        self.names.append(company_name)
+        search_name = company_name.lower()
+        self._search_names.append(search_name)
+
+        for token, exact, partial in [(t, SCORE_TOKEN_EXACT, SCORE_TOKEN_PREFIX) for t in tokenize(company_name)] + \
+                                     [(t, SCORE_ID_PREFIX, SCORE_ID_PREFIX) for t in tokenize(company_id)]:
+            for end in range(1, len(token) + 1):
+                score = exact if end == len(token) else partial
+                postings = self._prefixes.setdefault(token[:end], {})
+                if postings.get(doc, 0) < score:
+                    postings[doc] = score
+        for gram in trigrams(search_name):
+            self._trigrams.setdefault(gram, set()).add(doc)
+        for token in set(tokenize(about_company)):
+            self._about.setdefault(token, set()).add(doc)
+
+    def _token_matches(self, token):
+        """{doc: score} for one query token"""
+        matches = dict(self._prefixes.get(token, {}))
+        # Substring anywhere in the name (e.g. "bank" in "IndusInd Bank")
+        if len(token) >= 3:
+            grams = trigrams(token)
+            candidates = set.intersection(*(self._trigrams.get(g, set()) for g in grams))
+            for doc in candidates:
+                if doc not in matches and token in self._search_names[doc]:
+                    matches[doc] = SCORE_SUBSTRING
+        for doc in self._about.get(token, ()):
+            if doc not in matches:
+                matches[doc] = SCORE_ABOUT
+        return matches
+
+    def search(self, query, limit=20):
+        """Ranked [(company_id, company_name, score)]; every query token must match"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = None
+        for token in tokens:
+            matches = self._token_matches(token)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {doc: scores[doc] + score for doc, score in matches.items() if doc in scores}
+            if not scores:
+                return []
+
+        phrase = " ".join(tokens)
+        normalized_query = query.strip().lower()
+        for doc in scores:
+            if self.ids[doc].lower() == normalized_query:
+                scores[doc] += SCORE_EXACT_ID
+            if " ".join(tokenize(self._search_names[doc])).startswith(phrase):
+                scores[doc] += SCORE_NAME_PREFIX
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.names[item[0]]), self.names[item[0]]))
+        return [(self.ids[doc], self.names[doc], score) for doc, score in ranked[:limit]]
+
+
+class SearchIndexHolder:
+    """Keeps the current SearchIndex and rebuilds it when the data version moves"""
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self, version, load_rows):
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                self._index = SearchIndex(load_rows(), version=version)
+            return self._index
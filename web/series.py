@@ -0,0 +1,69 @@
+# web/series.py
+#
+# Yearly statement history of one company for /api/company/<id>/series, in
+# columnar form: one array per field, in year order, per table:
+#
+#     {"profitandloss": {"year": ["Mar 2019", ...], "sales": [...], ...}, ...}
+#
+# Bodies are compact JSON, compressed with brotli (when the optional brotli
+# package is installed) or gzip, whichever the client accepts.
+
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fields served per table, besides year
+SERIES_FIELDS = {
+    "profitandloss": ["sales", "expenses", "operating_profit", "opm_percentage", "other_income",
+                      "interest", "depreciation", "profit_before_tax", "tax_percentage", "net_profit",
+                      "eps", "dividend_payout"],
+    "balancesheet": ["equity_capital", "reserves", "borrowings", "other_liabilities", "total_liabilities",
+                     "fixed_assets", "cwip", "investments", "other_asset", "total_assets"],
+    "cashflow": ["operating_activity", "investing_activity", "financing_activity", "net_cash_flow"],
+}
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 512
+
+
+def _number(value):
+    if value is None or isinstance(value, int):
+        return value
+    return float(value)
+
+
+def load_series(cursor, company_id):
+    """{table: {"year": [...], field: [...]}} for one company (empty arrays without rows)"""
+    tables = {}
+    for table, fields in SERIES_FIELDS.items():
+        cursor.execute(f"SELECT year, {', '.join(fields)} FROM {table} WHERE company_id = %s ORDER BY year",
+                       (company_id,))
+        rows = cursor.fetchall()
+        columns = {"year": [row[0] for row in rows]}
+        for i, field in enumerate(fields, 1):
+            columns[field] = [_number(row[i]) for row in rows]
+        tables[table] = columns
+    return tables
+
+
+def choose_encoding(accept_encodings):
+    """"br", "gzip" or None (identity) from a werkzeug Accept-Encoding header object"""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def encode_body(payload, encoding):
+    """(body bytes, Content-Encoding or None) for a JSON payload"""
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body), "br"
+    return gzip.compress(body, compresslevel=9), "gzip"